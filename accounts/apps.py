@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # Keep the cached vendor choices in sync
+        import accounts.signals
+
+        # Register the user admin outside the public schema only
+        from django.contrib import admin
+        from django.db import connection
+        from django_tenants.utils import get_public_schema_name
+        from .admin import CustomUserAdmin
+        from .models import User
+
+        if connection.schema_name != get_public_schema_name():
+            admin.site.register(User, CustomUserAdmin)
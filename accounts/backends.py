@@ -1,8 +1,19 @@
+import functools
+
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+
+from .models import UserType
 
 User = get_user_model()
 
+@functools.cache
+def _dummy_hash():
+    # Hashed on first use, not at import, so unknown phone numbers cost the
+    # same as a wrong password without slowing every manage.py command
+    return make_password('!dummy!')
+
 class PhoneNumberBackend(ModelBackend):
     """Authenticate users using phone number instead of username"""
     
@@ -12,7 +23,15 @@ class PhoneNumberBackend(ModelBackend):
             if user.check_password(password):
                 return user
         except User.DoesNotExist:
+            # Run the hasher anyway to avoid leaking which numbers are registered
+            check_password(password, _dummy_hash())
             return None
         except User.MultipleObjectsReturned:
             # Should never happen with unique phone_number field
-            return None
\ No newline at end of file
+            return None
+    
+    def get_all_permissions(self, user_obj, obj=None):
+        # End users are never granted permissions, skip the group/permission joins
+        if getattr(user_obj, 'user_type', None) == UserType.END_USER and not user_obj.is_superuser:
+            return set()
+        return super().get_all_permissions(user_obj, obj)
\ No newline at end of file
@@ -1,10 +1,23 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from .models import User
+from .models import User, UserType, VENDOR_ROLES
 from vendors.models import Vendor
 
+VENDOR_CHOICES_CACHE_KEY = 'accounts:vendor_choices'
+VENDOR_CHOICES_TIMEOUT = 60
+
+
+def get_vendor_choices():
+    """Return cached (id, name) pairs for the vendor dropdown"""
+    choices = cache.get(VENDOR_CHOICES_CACHE_KEY)
+    if choices is None:
+        choices = list(Vendor.objects.order_by('business_name').values_list('id', 'business_name'))
+        cache.set(VENDOR_CHOICES_CACHE_KEY, choices, VENDOR_CHOICES_TIMEOUT)
+    return choices
+
 class EndUserRegistrationForm(UserCreationForm):
     """Registration form for end users - only phone + password"""
     
@@ -27,12 +40,21 @@ class EndUserRegistrationForm(UserCreationForm):
         self.fields.pop('national_id', None)
         
         # Set user_type to end_user automatically
-        self.instance.user_type = 'end_user'
+        self.instance.user_type = UserType.END_USER
     
     def clean_phone_number(self):
         """Accept multiple phone formats"""
         phone_number = self.cleaned_data.get('phone_number')
         return phone_number  # Validation handled by model
+    
+    def save(self, commit=True):
+        user = super().save(commit=False)
+        # Set default names from phone number
+        user.first_name = "User"
+        user.last_name = self.cleaned_data['phone_number'][-4:]  # Last 4 digits
+        if commit:
+            user.save()
+        return user
 
 class VendorStaffRegistrationForm(UserCreationForm):
     """Registration form for vendor staff - requires email and national ID"""
@@ -52,10 +74,15 @@ class VendorStaffRegistrationForm(UserCreationForm):
         self.fields['email'].required = True
         self.fields['national_id'].required = True
         
+        # Render the vendor dropdown from cache; the queryset is only hit on submit
+        vendor_field = self.fields['vendor']
+        vendor_field.queryset = Vendor.objects.only('id', 'business_name').order_by('business_name')
+        vendor_field.choices = [('', vendor_field.empty_label), *get_vendor_choices()]
+        
         # Limit user_type choices to vendor staff only
         self.fields['user_type'].choices = [
-            ('vendor_admin', 'Vendor Admin'),
-            ('vendor_staff', 'Vendor Staff'),
+            (UserType.VENDOR_ADMIN, UserType.VENDOR_ADMIN.label),
+            (UserType.VENDOR_STAFF, UserType.VENDOR_STAFF.label),
         ]
     
     def clean(self):
@@ -66,7 +93,7 @@ class VendorStaffRegistrationForm(UserCreationForm):
         email = cleaned_data.get('email')
         national_id = cleaned_data.get('national_id')
         
-        if user_type in ['vendor_admin', 'vendor_staff']:
+        if user_type in VENDOR_ROLES:
             if not vendor:
                 raise ValidationError('Vendor is required for vendor staff accounts.')
             if not email:
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-15 09:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.HashIndex(fields=['phone_number'], name='user_phone_hash_idx'),
+        ),
+    ]
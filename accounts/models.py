@@ -1,5 +1,9 @@
+import functools
+import re
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.contrib.postgres.indexes import HashIndex
 from django.core.validators import RegexValidator
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -7,10 +11,52 @@ from django.core.exceptions import ValidationError
 
 from core.models import BaseModel
 
+class UserType(models.TextChoices):
+    VENDOR_ADMIN = 'vendor_admin', 'Vendor Admin'
+    VENDOR_STAFF = 'vendor_staff', 'Vendor Staff'
+    END_USER = 'end_user', 'End User'
+
+
+VENDOR_ROLES = frozenset({UserType.VENDOR_ADMIN, UserType.VENDOR_STAFF})
+
+_NON_DIGIT = re.compile(r'\D')
+_KENYAN_PHONE = re.compile(r'^(\+?254|0)?[17]\d{8}$')
+
+
+def _prefix_country_code(phone_number):
+    # 721630939 to 254721630939
+    return '254' + phone_number
+
+
+def _replace_trunk_prefix(phone_number):
+    # Convert 0721630939 to 254721630939
+    return '254' + phone_number[1:]
+
+
+# Keyed on (length, first digit); anything else (e.g. 254721630939) is
+# returned as-is and left to the model validator
+_NORMALIZERS = {
+    (10, '0'): _replace_trunk_prefix,
+    **{(9, digit): _prefix_country_code for digit in '0123456789'},
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_phone(phone_number):
+    """Convert any phone format to standard 254 format"""
+    # Remove any non-digit characters
+    phone_number = _NON_DIGIT.sub('', phone_number)
+    normalizer = _NORMALIZERS.get((len(phone_number), phone_number[:1]))
+    return normalizer(phone_number) if normalizer else phone_number
+
 
 class UserManager(BaseUserManager):  # ← Change to BaseUserManager
     """Custom manager for User model with phone number authentication"""
     
+    def get_queryset(self):
+        # The vendor is read on most authenticated requests, load it in the same query
+        return super().get_queryset().select_related('vendor')
+    
     def create_user(self, phone_number, password=None, **extra_fields):
         """Create and save a regular user with the given phone number and password"""
         if not phone_number:
@@ -20,7 +66,7 @@ class UserManager(BaseUserManager):  # ← Change to BaseUserManager
         phone_number = self.normalize_phone_number(phone_number)
         
         # Set default user_type to 'end_user' if not specified
-        extra_fields.setdefault('user_type', 'end_user')
+        extra_fields.setdefault('user_type', UserType.END_USER)
         
         user = self.model(phone_number=phone_number, **extra_fields)
         user.set_password(password)
@@ -29,22 +75,7 @@ class UserManager(BaseUserManager):  # ← Change to BaseUserManager
 
     def normalize_phone_number(self, phone_number):
         """Convert any phone format to standard 254 format"""
-        # Remove any non-digit characters except +
-        phone_number = ''.join(filter(str.isdigit, phone_number))
-        
-        # Handle different formats
-        if phone_number.startswith('0') and len(phone_number) == 10:
-            # Convert 0721630939 to 254721630939
-            return '254' + phone_number[1:]
-        elif phone_number.startswith('254') and len(phone_number) == 12:
-            # Already in 254 format
-            return phone_number
-        elif len(phone_number) == 9:
-            # 721630939 to 254721630939
-            return '254' + phone_number
-        else:
-            # Return as-is (will be validated by model)
-            return phone_number
+        return _normalize_phone(phone_number)
 
     def create_superuser(self, phone_number, password=None, **extra_fields):
         """Create superuser with vendor_admin as default type"""
@@ -52,7 +83,9 @@ class UserManager(BaseUserManager):  # ← Change to BaseUserManager
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
         extra_fields.setdefault('is_active', True)
-        extra_fields.setdefault('user_type', 'vendor_admin')
+        extra_fields.setdefault('user_type', UserType.VENDOR_ADMIN)
+        extra_fields.setdefault('first_name', '')
+        extra_fields.setdefault('last_name', '')
 
         # Validate superuser flags
         if extra_fields.get('is_staff') is not True:
@@ -66,11 +99,8 @@ class UserManager(BaseUserManager):  # ← Change to BaseUserManager
 class User(AbstractUser, BaseModel):
     """Custom User model that exists in each tenant's schema"""
     
-    USER_TYPE_CHOICES = (
-        ('vendor_admin', 'Vendor Admin'),
-        ('vendor_staff', 'Vendor Staff'),
-        ('end_user', 'End User'),
-    )
+    USER_TYPE_CHOICES = UserType.choices
+    _USER_TYPE_DISPLAY = dict(USER_TYPE_CHOICES)
     
     # Remove username field, use phone number instead
     username = None
@@ -81,7 +111,7 @@ class User(AbstractUser, BaseModel):
         unique=True,
         validators=[
             RegexValidator(
-                regex=r'^(\+?254|0)?[17]\d{8}$',
+                regex=_KENYAN_PHONE.pattern,
                 message="Enter a valid Kenyan phone number (e.g., 0721630939, +254721630939, 254721630939)"
             )
         ],
@@ -117,7 +147,7 @@ class User(AbstractUser, BaseModel):
     user_type = models.CharField(
         max_length=20,
         choices=USER_TYPE_CHOICES,
-        default='end_user'
+        default=UserType.END_USER
     )
     
     # Vendor relationship
@@ -130,20 +160,31 @@ class User(AbstractUser, BaseModel):
     )
 
     objects = UserManager()
+    raw_objects = models.Manager()  # Plain queryset without the vendor join
     
     USERNAME_FIELD = 'phone_number'
-    REQUIRED_FIELDS = ['first_name', 'last_name']
+    REQUIRED_FIELDS = []
     
     class Meta:
         verbose_name = _('User')
         verbose_name_plural = _('Users')
+        indexes = [
+            # Equality-only lookup used by PhoneNumberBackend.authenticate
+            HashIndex(fields=['phone_number'], name='user_phone_hash_idx'),
+        ]
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Remember the loaded phone number so unchanged saves skip normalization
+        # (read from __dict__ so a deferred field doesn't trigger a query)
+        self._original_phone = self.__dict__.get('phone_number')
     
     def __str__(self):
-        return f"{self.phone_number} ({self.get_user_type_display()})"
+        return f"{self.phone_number} ({User._USER_TYPE_DISPLAY.get(self.user_type, self.user_type)})"
     
     def clean(self):
         """Validate that vendors have email and national ID"""
-        if self.user_type in ['vendor_admin', 'vendor_staff']:
+        if self.user_type in VENDOR_ROLES:
             if not self.email:
                 raise ValidationError('Email address is required for vendor accounts.')
             if not self.national_id:
@@ -151,22 +192,28 @@ class User(AbstractUser, BaseModel):
     
     def save(self, *args, **kwargs):
         """Auto-set vendor to None for end users and normalize phone number"""
-        if self.user_type == 'end_user':
+        if self.user_type == UserType.END_USER and (self.vendor_id is not None or self.national_id is not None):
             self.vendor = None
             self.national_id = None  # Clear national ID for end users
+            # Make sure partial saves still persist the cleared fields
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'vendor', 'national_id'}
         
-        # Normalize phone number before saving
-        self.phone_number = User.objects.normalize_phone_number(self.phone_number)
+        # Normalize phone number before saving (only when new or changed)
+        if self._state.adding or self.phone_number != self._original_phone:
+            self.phone_number = User.objects.normalize_phone_number(self.phone_number)
         
         super().save(*args, **kwargs)
+        self._original_phone = self.phone_number
     
     @property
     def is_end_user(self):
-        return self.user_type == 'end_user'
+        return self.user_type == UserType.END_USER
     
     @property
     def is_vendor_staff(self):
-        return self.user_type in ['vendor_admin', 'vendor_staff']
+        return self.user_type in VENDOR_ROLES
     
     @property
     def formatted_phone(self):
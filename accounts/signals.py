@@ -0,0 +1,11 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from vendors.models import Vendor
+from .forms import VENDOR_CHOICES_CACHE_KEY
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+def clear_vendor_choices(sender, **kwargs):
+    cache.delete(VENDOR_CHOICES_CACHE_KEY)
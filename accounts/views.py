@@ -6,6 +6,10 @@ from django.urls import reverse_lazy
 from django.http import HttpResponseRedirect
 
 from .forms import EndUserRegistrationForm, VendorStaffRegistrationForm
+from .models import User
+
+_VENDOR_DASHBOARD = reverse_lazy('vendors:dashboard')
+_TENANT_DASHBOARD = reverse_lazy('tenants:dashboard')
 
 def login_view(request):
     """Login view for all users - phone number + password"""
@@ -15,21 +19,19 @@ def login_view(request):
         
         # Normalize phone number (remove + and ensure 254 format)
         if phone_number:
-            phone_number = ''.join(filter(str.isdigit, phone_number))
-            if phone_number.startswith('0') and len(phone_number) == 10:
-                phone_number = '254' + phone_number[1:]
+            phone_number = User.objects.normalize_phone_number(phone_number)
         
         user = authenticate(request, phone_number=phone_number, password=password)
         
         if user is not None:
             login(request, user)
-            messages.success(request, f'Welcome back, {user.get_full_name()}!')
+            messages.success(request, f'Welcome back, {user.phone_number}!')
             
             # Redirect based on user type
             if user.is_vendor_staff:
-                return redirect('vendors:dashboard')
+                return HttpResponseRedirect(str(_VENDOR_DASHBOARD))
             else:
-                return redirect('tenants:dashboard')
+                return HttpResponseRedirect(str(_TENANT_DASHBOARD))
         else:
             messages.error(request, 'Invalid phone number or password.')
     
@@ -42,14 +44,9 @@ def end_user_register(request):
         if form.is_valid():
             user = form.save()
             
-            # Set default names from phone number
-            user.first_name = "User"
-            user.last_name = form.cleaned_data['phone_number'][-4:]  # Last 4 digits
-            user.save()
-            
             login(request, user)
             messages.success(request, 'Registration successful! Welcome to OviLink.')
-            return redirect('tenants:dashboard')
+            return HttpResponseRedirect(str(_TENANT_DASHBOARD))
     else:
         form = EndUserRegistrationForm()
     
@@ -69,7 +66,7 @@ def vendor_staff_register(request):
             user = form.save()
             login(request, user)
             messages.success(request, 'Vendor staff account created successfully!')
-            return redirect('vendors:dashboard')
+            return HttpResponseRedirect(str(_VENDOR_DASHBOARD))
     else:
         form = VendorStaffRegistrationForm()
     
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .mpesa.models import AccessToken, AllMpesaTransactions
+from .mpesa.models import AccessToken, AllMpesaTransactions, MpesaRequest
 
 # Register your models here.
 @admin.register(AllMpesaTransactions)
@@ -18,4 +18,17 @@ class TransactionAdmin(admin.ModelAdmin):
         'checkout_request_id',
         'response_code',
         'Amount',
-    ]
\ No newline at end of file
+    ]
+    ordering = ['-created_at']
+    list_per_page = 50
+    # Skip the unfiltered COUNT(*) on large transaction tables
+    show_full_result_count = False
+
+
+@admin.register(MpesaRequest)
+class MpesaRequestAdmin(admin.ModelAdmin):
+    list_display = ['id', 'method', 'status', 'response_code', 'checkout_request_id', 'created_at']
+    list_filter = ['status', 'method']
+    search_fields = ['id', 'merchant_request_id', 'checkout_request_id', 'conversation_id']
+    ordering = ['-created_at']
+    list_per_page = 50
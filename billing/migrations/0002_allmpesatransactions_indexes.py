@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='allmpesatransactions',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddIndex(
+            model_name='allmpesatransactions',
+            index=models.Index(fields=['-created_at'], name='billing_all_created_fef7b2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='allmpesatransactions',
+            index=models.Index(fields=['response_code'], name='billing_all_respons_c114d7_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-15 10:30
+
+from django.db import migrations, models
+
+
+def drop_stale_tokens(apps, schema_editor):
+    # Tokens are short-lived; the next request regenerates one under pk=1
+    AccessToken = apps.get_model('billing', 'AccessToken')
+    AccessToken.objects.exclude(pk=1).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_allmpesatransactions_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_stale_tokens, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='accesstoken',
+            constraint=models.CheckConstraint(condition=models.Q(('id', 1)), name='mpesa_access_token_singleton'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-15 17:30
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_accesstoken_singleton'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MpesaRequest',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('method', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('response_code', models.CharField(blank=True, max_length=10)),
+                ('merchant_request_id', models.CharField(blank=True, max_length=100)),
+                ('checkout_request_id', models.CharField(blank=True, max_length=100)),
+                ('conversation_id', models.CharField(blank=True, max_length=100)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='billing_mpe_status_886689_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import uuid
+
 from django.db import models
 
 
@@ -8,8 +10,14 @@ class AccessToken(models.Model):
 	token = models.CharField(max_length=30)
 	created_at = models.DateTimeField(auto_now_add=True)
 
+	# Single row, always stored under this primary key
+	SINGLETON_PK = 1
+
 	class Meta:
 		get_latest_by = 'created_at'
+		constraints = [
+			models.CheckConstraint(condition=models.Q(id=1), name='mpesa_access_token_singleton'),
+		]
 
 	def __str__(self):
 		return self.token
@@ -23,5 +31,44 @@ class AllMpesaTransactions(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     Amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True) # DecimalField()
 
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['response_code']),
+        ]
+
+    def __str__(self):
+        return f"Transaction {self.merchant_request_id} - {self.response_code}"
+
+
+class MpesaRequest(models.Model):
+    """
+    Daraja call queued by a view, created before the job runs so it can be
+    polled and so a job lost with its worker still leaves a pending row
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    method = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    response_code = models.CharField(max_length=10, blank=True)
+    merchant_request_id = models.CharField(max_length=100, blank=True)
+    checkout_request_id = models.CharField(max_length=100, blank=True)
+    conversation_id = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
     def __str__(self):
-        return f"Transaction {self.merchant_request_id} - {self.response_code}"
\ No newline at end of file
+        return f"{self.method} {self.pk} - {self.status}"
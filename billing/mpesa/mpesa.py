@@ -1,13 +1,16 @@
+import functools
 import requests
 from django.conf import settings
+from django.db import transaction
 import base64
 from .exceptions import MpesaInvalidParameterException, MpesaConnectionError
 from datetime import datetime
-from .utils import mpesa_access_token, format_phone, api_base_url, mpesa_response, mpesa_config, encrypt_security_credential
-import json
+from .utils import SESSION, json_loads, mpesa_access_token, format_phone, api_base_url, mpesa_response, mpesa_config, encrypt_security_credential
 from tenants.models import MpesaTransaction
 from .models import AllMpesaTransactions
 
+_TIMEOUT = (3.0, 10.0)  # (connect, read) seconds
+
 class MpesaAPI:
     """
     This is the core MPESA client.
@@ -21,14 +24,18 @@ class MpesaAPI:
         self.consumer_secret = settings.MPESA_CONSUMER_SECRET
         self.shortcode = settings.MPESA_SHORTCODE
         self.passkey = settings.MPESA_PASSKEY
+        # Constant per client: only the timestamp changes between STK pushes
+        self._password_prefix = f"{self.shortcode}{self.passkey}".encode()
+        self._url_stk = api_base_url() + "mpesa/stkpush/v1/processrequest"
 
     def get_access_token(self):
+        # mpesa_access_token() keeps the single in-process token cache
         return mpesa_access_token()
     
     def parse_stk_result(self, result):
         """Parse the result of Lipa na MPESA ONLINE Payment (STK PUSH)
         Returns the result data as a dict."""
-        payload = json.loads(result)
+        payload = json_loads(result)
         data = {}
         callback = payload['Body']['stkCallback']
         data['ResultCode'] = callback['ResultCode']
@@ -37,34 +44,28 @@ class MpesaAPI:
         data['CheckoutRequestID'] = callback['CheckoutRequestID']
         metadata = callback.get('CallbackMetadata')
         if metadata:
-            metadata_items = metadata.get('Item')
-            for item in metadata_items:
-                data[item['Name']] = item.get('Value')
+            data.update({item['Name']: item.get('Value') for item in metadata.get('Item', ())})
         return data
     
-    
+    @staticmethod
     def save_mpesa_transaction(data):
         """
         Save Mpesa transaction details to the database.
         Expects a dict with keys: MerchantRequestID, CheckoutRequestID, ResultCode, ResultDesc, CustomerMessage
         """
-        MpesaTransaction.objects.create(
-            merchant_request_id=data.get('MerchantRequestID', ''),
-            checkout_request_id=data.get('CheckoutRequestID', ''),
-            response_code=str(data.get('ResultCode', '')),
-            response_description=data.get('ResultDesc', ''),
-            customer_message=data.get('CustomerMessage', ''),
-            amount=data.get('Amount')
-            )
-        
-        AllMpesaTransactions.objects.create(
-            merchant_request_id=data.get('MerchantRequestID', ''),
-            checkout_request_id=data.get('CheckoutRequestID', ''),
-            response_code=str(data.get('ResultCode', '')),
-            response_description=data.get('ResultDesc', ''),
-            customer_message=data.get('CustomerMessage', ''),
-            amount=data.get('Amount')
-            )
+        fields = {
+            'merchant_request_id': data.get('MerchantRequestID', ''),
+            'checkout_request_id': data.get('CheckoutRequestID', ''),
+            'response_code': str(data.get('ResultCode', '')),
+            'response_description': data.get('ResultDesc', ''),
+            'customer_message': data.get('CustomerMessage', ''),
+        }
+        amount = data.get('Amount')
+        # Both rows go out in a single transaction; the public-schema copy
+        # names its amount column 'Amount'
+        with transaction.atomic():
+            MpesaTransaction.objects.create(amount=amount, **fields)
+            AllMpesaTransactions.objects.create(Amount=amount, **fields)
   
     
     def stk_push(self, phone_number, amount, account_reference,
@@ -73,7 +74,7 @@ class MpesaAPI:
         phone_number = format_phone(phone_number)
         access_token = self.get_access_token()
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        password = base64.b64encode(f"{self.shortcode}{self.passkey}{timestamp}".encode()).decode()
+        password = base64.b64encode(self._password_prefix + timestamp.encode()).decode()
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
@@ -91,19 +92,18 @@ class MpesaAPI:
             "AccountReference": account_reference,
             "TransactionDesc": transaction_desc
         }
-        url = api_base_url() + "mpesa/stkpush/v1/processrequest"
         try:
-            r = requests.post(url, json=payload, headers=headers)
+            r = SESSION.post(self._url_stk, json=payload, headers=headers, timeout=_TIMEOUT)
             resp_data = mpesa_response(r)
             # Save transaction if response contains required fields
-            if 'MerchantRequestID' in resp_data and 'CheckoutRequestID' in resp_data:
-                save_mpesa_transaction({
-                    'MerchantRequestID': resp_data.get('MerchantRequestID'),
-                    'CheckoutRequestID': resp_data.get('CheckoutRequestID'),
-                    'ResultCode': resp_data.get('ResponseCode', resp_data.get('ResultCode', '')),
-                    'ResultDesc': resp_data.get('ResponseDescription', resp_data.get('ResultDesc', '')),
-                    'CustomerMessage': resp_data.get('CustomerMessage', ''),
-                    'Amount': resp_data.get('Amount')
+            if resp_data.merchant_request_id and resp_data.checkout_request_id:
+                self.save_mpesa_transaction({
+                    'MerchantRequestID': resp_data.merchant_request_id,
+                    'CheckoutRequestID': resp_data.checkout_request_id,
+                    'ResultCode': resp_data.response_code,
+                    'ResultDesc': resp_data.response_description,
+                    'CustomerMessage': resp_data.customer_message,
+                    'Amount': amount
                     })
             return resp_data
         except requests.exceptions.ConnectionError:
@@ -151,19 +151,19 @@ class MpesaAPI:
             'Occassion': occassion
         }
         headers = {
-            'Authorization': 'Bearer ' + mpesa_access_token(),
+            'Authorization': 'Bearer ' + self.get_access_token(),
             'Content-type': 'application/json'
         }
         try:
-            r = requests.post(url, json=data, headers=headers)
+            r = SESSION.post(url, json=data, headers=headers, timeout=_TIMEOUT)
             response = mpesa_response(r)
-            if 'MerchantRequestID' in response and 'CheckoutRequestID' in response:
-                save_mpesa_transaction({
-                    'MerchantRequestID': response.get('MerchantRequestID'),
-                    'CheckoutRequestID': response.get('CheckoutRequestID'),
-                    'ResultCode': response.get('ResponseCode', response.get('ResultCode', '')),
-                    'ResultDesc': response.get('ResponseDescription', response.get('ResultDesc', '')),
-                    'CustomerMessage': response.get('CustomerMessage', '')
+            if response.merchant_request_id and response.checkout_request_id:
+                self.save_mpesa_transaction({
+                    'MerchantRequestID': response.merchant_request_id,
+                    'CheckoutRequestID': response.checkout_request_id,
+                    'ResultCode': response.response_code,
+                    'ResultDesc': response.response_description,
+                    'CustomerMessage': response.customer_message
                 })
             return response
         except requests.exceptions.ConnectionError:
@@ -182,3 +182,10 @@ class MpesaAPI:
     def promotion_payment(self, phone_number, amount, transaction_desc, callback_url, occassion):
         command_id = 'PromotionPayment'
         return self.b2c_payment(phone_number, amount, transaction_desc, callback_url, occassion, command_id)
+
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Build the MpesaAPI client on first use, once per worker"""
+    return MpesaAPI()
@@ -0,0 +1,49 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connection, transaction
+from django_tenants.utils import schema_context
+
+from .models import MpesaRequest
+from .mpesa import get_client
+
+logger = logging.getLogger(__name__)
+
+# Daraja round-trips take 0.5-2s. Results come back on the callback URLs,
+# so views hand the call to this pool instead of holding a worker for it.
+# The pool is in-process: an MpesaRequest row is written first, so a job
+# lost with its worker stays visible as pending instead of vanishing.
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='mpesa')
+
+
+def _run(schema_name, request_id, method, args):
+    try:
+        # Transactions are saved in the schema of the tenant that queued the call
+        with schema_context(schema_name):
+            response = getattr(get_client(), method)(*args)
+        MpesaRequest.objects.filter(pk=request_id).update(
+            status='sent',
+            response_code=getattr(response, 'response_code', ''),
+            merchant_request_id=getattr(response, 'merchant_request_id', ''),
+            checkout_request_id=getattr(response, 'checkout_request_id', ''),
+            conversation_id=getattr(response, 'conversation_id', ''),
+        )
+    except Exception as e:
+        logger.exception("M-Pesa %s call failed", method)
+        MpesaRequest.objects.filter(pk=request_id).update(status='failed', error=str(e))
+    finally:
+        close_old_connections()
+
+
+def dispatch(method, *args):
+    """
+    Record a pending MpesaRequest and run MpesaAPI.<method>(*args) for it in
+    the background; returns the MpesaRequest
+    """
+    mpesa_request = MpesaRequest.objects.create(method=method)
+    schema_name = connection.schema_name
+    # Start the job only once the row is visible to its thread
+    transaction.on_commit(
+        lambda: _EXECUTOR.submit(_run, schema_name, mpesa_request.pk, method, args)
+    )
+    return mpesa_request
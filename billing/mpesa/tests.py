@@ -1,3 +1,69 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from . import tasks
+from .models import MpesaRequest
+from .utils import format_phone
+
+
+class FormatPhoneTests(SimpleTestCase):
+    def test_local_formats(self):
+        self.assertEqual(format_phone('0712345678'), '254712345678')
+        self.assertEqual(format_phone('712345678'), '254712345678')
+        self.assertEqual(format_phone('+254 712-345-678'), '254712345678')
+        self.assertEqual(format_phone(254712345678), '254712345678')
+
+    def test_empty_input_is_returned_unchanged(self):
+        self.assertEqual(format_phone(''), '')
+        self.assertIsNone(format_phone(None))
+
+    def test_non_ascii_separators_are_dropped(self):
+        # No-break and thin spaces, as pasted from formatted contact cards
+        self.assertEqual(format_phone('0712 345 678'), '254712345678')
+
+    def test_non_ascii_digits_are_transliterated(self):
+        self.assertEqual(format_phone('０７１２３４５６７８'), '254712345678')
+        self.assertEqual(format_phone('٠٧١٢٣٤٥٦٧٨'), '254712345678')
+
+    def test_result_is_ascii_digits_only(self):
+        for phone in ('+254 712 345 678', '➕254712345678', '07²12345678'):
+            with self.subTest(phone=phone):
+                self.assertRegex(format_phone(phone), r'^[0-9]+$')
+
+
+# _run closes the thread's connection when done; keep the test's open
+@mock.patch.object(tasks, 'close_old_connections', mock.Mock())
+@mock.patch.object(tasks, '_EXECUTOR')
+class DispatchTests(TestCase):
+    def test_dispatch_records_pending_request(self, executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            mpesa_request = tasks.dispatch('stk_push', '0712345678', 1)
+
+        self.assertEqual(MpesaRequest.objects.get(pk=mpesa_request.pk).status, 'pending')
+        executor.submit.assert_called_once_with(
+            tasks._run, 'public', mpesa_request.pk, 'stk_push', ('0712345678', 1)
+        )
+
+    def test_run_marks_request_sent(self, executor):
+        mpesa_request = MpesaRequest.objects.create(method='stk_push')
+        response = mock.Mock(response_code='0', merchant_request_id='m-1', checkout_request_id='c-1', conversation_id='')
+
+        with mock.patch.object(tasks, 'get_client') as get_client:
+            get_client.return_value.stk_push.return_value = response
+            tasks._run('public', mpesa_request.pk, 'stk_push', ('0712345678', 1))
+
+        mpesa_request.refresh_from_db()
+        self.assertEqual(mpesa_request.status, 'sent')
+        self.assertEqual(mpesa_request.checkout_request_id, 'c-1')
+
+    def test_run_marks_request_failed(self, executor):
+        mpesa_request = MpesaRequest.objects.create(method='stk_push')
+
+        with mock.patch.object(tasks, 'get_client') as get_client:
+            get_client.return_value.stk_push.side_effect = Exception('timeout')
+            tasks._run('public', mpesa_request.pk, 'stk_push', ('0712345678', 1))
+
+        mpesa_request.refresh_from_db()
+        self.assertEqual(mpesa_request.status, 'failed')
+        self.assertEqual(mpesa_request.error, 'timeout')
@@ -2,36 +2,107 @@
 General utilities for the MPESA functions
 """
 
-from __future__ import print_function
 from .exceptions import MpesaConfigurationException, IllegalPhoneNumberException, MpesaConnectionError, MpesaError
 from .models import AccessToken
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.utils import timezone
 from decouple import config, UndefinedValueError
 import os
-import json
-from requests import Response
+try:
+	from orjson import loads as json_loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+	from json import loads as json_loads
+import functools
+import threading
 import time
 from django.conf import settings
-import base64
+import binascii
+import unicodedata
 from cryptography import x509
 from cryptography.x509 import load_der_x509_certificate
 from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
 from cryptography.hazmat.primitives.asymmetric import padding
-import re
 
+# str.translate table dropping every ASCII character that is not a digit;
+# non-ASCII input takes the slower path in format_phone
+_NON_DIGIT_TABLE = dict.fromkeys(c for c in range(128) if not 48 <= c <= 57)
+
+# One keep-alive session for every Daraja call so the TLS connection is reused.
+# Transient gateway errors on idempotent requests are retried by the adapter.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+	pool_connections=4,
+	pool_maxsize=50,
+	max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False),
+))
+
+# Daraja reports each token's lifetime in expires_in (3599s today); refresh
+# this long before it runs out so in-flight requests never carry a dead token
+_TOKEN_LIFETIME = 3599
+_TOKEN_SAFETY_MARGIN = 60
+_TOKEN_CACHE = {'token': None, 'expires_at': 0.0}
+_TOKEN_LOCK = threading.Lock()
+
+# MPESA_* keys read through mpesa_config(); any other MPESA_* setting is
+# picked up from the settings module when the snapshot is taken
+_MPESA_CONFIG_KEYS = frozenset({
+	'MPESA_ENVIRONMENT',
+	'MPESA_CONSUMER_KEY',
+	'MPESA_CONSUMER_SECRET',
+	'MPESA_SHORTCODE',
+	'MPESA_INITIATOR_USERNAME',
+	'MPESA_INITIATOR_SECURITY_CREDENTIAL',
+})
+_MPESA_CONFIG_SNAPSHOT = None
+_CONFIG_LOCK = threading.Lock()
+
+
+# (MpesaResponse attribute, Daraja JSON key)
+_FIELD_MAP = (
+	('request_id', 'requestId'),
+	('response_code', 'ResponseCode'),
+	('response_description', 'ResponseDescription'),
+	('customer_message', 'CustomerMessage'),
+	('conversation_id', 'ConversationID'),
+	('originator_conversation_id', 'OriginatorConversationID'),
+	('error_code', 'errorCode'),
+	('error_message', 'errorMessage'),
+	('merchant_request_id', 'MerchantRequestID'),
+	('checkout_request_id', 'CheckoutRequestID'),
+)
+
+
+class MpesaResponse:
+	"""
+	Parsed Daraja fields on top of a requests.Response
+
+	Anything else (status_code, json(), ...) is read from the wrapped response.
+	"""
 
-class MpesaResponse(Response):
-	request_id = ''
-	response_code = ''
-	response_description = ''
-	customer_message = ''
-	conversation_id = ''
-	originator_conversation_id = ''
-	error_code = ''
-	error_message = ''
-	merchant_request_id = ''
-	checkout_request_id = ''
+	__slots__ = (
+		'response',
+		'request_id',
+		'response_code',
+		'response_description',
+		'customer_message',
+		'conversation_id',
+		'originator_conversation_id',
+		'error_code',
+		'error_message',
+		'merchant_request_id',
+		'checkout_request_id',
+	)
+
+	def __init__(self, response, data):
+		self.response = response
+		get = data.get
+		for attr, key in _FIELD_MAP:
+			setattr(self, attr, get(key, ''))
+
+	def __getattr__(self, name):
+		return getattr(self.response, name)
 
 
 def mpesa_response(r):
@@ -42,24 +113,49 @@ def mpesa_response(r):
 		r (requests.Response) -- The response to convert
 	"""
 
-	r.__class__ = MpesaResponse
-	json_response = r.json()
-	r.request_id = json_response.get('requestId', '')
-	r.response_code = json_response.get('ResponseCode', '')
-	r.response_description = json_response.get('ResponseDescription', '')
-	r.customer_message = json_response.get('CustomerMessage', '')
-	r.conversation_id = json_response.get('ConversationID', '')
-	r.originator_conversation_id = json_response.get('OriginatorConversationID', '')
-	r.error_code = json_response.get('errorCode')
-	r.error_message = json_response.get('errorMessage', '')
-	r.merchant_request_id = json_response.get('MerchantRequestID', '')
-	r.checkout_request_id = json_response.get('CheckoutRequestID', '')
-	return r
+	return MpesaResponse(r, json_loads(r.content))
+
+
+def _resolve_mpesa_config(key):
+	"""
+	Read a configuration key from settings, falling back to the environment
+	"""
+
+	value = getattr(settings, key, None)
+	if value is None:
+		try:
+			value = config(key)
+		except UndefinedValueError:
+			# Check key in settings file
+			raise MpesaConfigurationException('Mpesa environment not configured properly - ' + key + ' not found')
 
+	return value
+
+def _snapshot_mpesa_config():
+	"""
+	Resolve every known MPESA_* key once into the module-level snapshot
+	"""
+
+	global _MPESA_CONFIG_SNAPSHOT
+
+	with _CONFIG_LOCK:
+		if _MPESA_CONFIG_SNAPSHOT is None:
+			keys = _MPESA_CONFIG_KEYS.union(k for k in dir(settings) if k.startswith('MPESA_'))
+			snapshot = {}
+			for key in keys:
+				try:
+					snapshot[key] = _resolve_mpesa_config(key)
+				except MpesaConfigurationException:
+					pass
+			_MPESA_CONFIG_SNAPSHOT = snapshot
+
+	return _MPESA_CONFIG_SNAPSHOT
 
 def mpesa_config(key):
 	"""
 	Get Mpesa configuration variable with the matching key
+
+	Values come from a per-process snapshot; see _clear_mpesa_config_cache()
 	
 	Arguments:
 		key (str) -- The configuration key
@@ -71,17 +167,18 @@ def mpesa_config(key):
 		MpesaConfigurationException: Key not found
 	"""
 
-	value = getattr(settings, key, None)
-	if value is None:
-		try:
-			value = config(key)
-		except UndefinedValueError:
-			# Check key in settings file
-			raise MpesaConfigurationException('Mpesa environment not configured properly - ' + key + ' not found')
-
-	return value
+	snapshot = _MPESA_CONFIG_SNAPSHOT
+	if snapshot is None:
+		snapshot = _snapshot_mpesa_config()
+	try:
+		return snapshot[key]
+	except KeyError:
+		# Not one of the known keys; resolve it and remember the value
+		value = snapshot[key] = _resolve_mpesa_config(key)
+		return value
 
 
+@functools.lru_cache(maxsize=None)
 def api_base_url():
 	"""
 	Gets the base URL for making API calls
@@ -104,6 +201,18 @@ def api_base_url():
 	else:
 		raise MpesaConfigurationException('Mpesa environment not configured properly - MPESA_ENVIRONMENT should be sandbox or production')
 
+def _clear_mpesa_config_cache():
+	"""
+	Forget memoized configuration, e.g. after tests override settings
+	"""
+
+	global _MPESA_CONFIG_SNAPSHOT
+
+	_MPESA_CONFIG_SNAPSHOT = None
+	api_base_url.cache_clear()
+	_certificate_path.cache_clear()
+	encrypt_security_credential.cache_clear()
+
 def generate_access_token_request(consumer_key = None, consumer_secret = None):
 	"""
 	Make a call to OAuth API to generate access token
@@ -124,11 +233,9 @@ def generate_access_token_request(consumer_key = None, consumer_secret = None):
 	consumer_secret = consumer_secret if consumer_secret is not None else mpesa_config('MPESA_CONSUMER_SECRET')
 
 	try:
-		r = requests.get(url, auth=(consumer_key, consumer_secret))
-	except requests.exceptions.ConnectionError:
+		r = SESSION.get(url, auth=(consumer_key, consumer_secret), timeout=(3.05, 10))
+	except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
 		raise MpesaConnectionError('Connection failed')
-	except Exception as ex:
-		return ex.message
 	
 	return r
 
@@ -145,15 +252,16 @@ def generate_access_token():
 
 	r = generate_access_token_request()
 	if r.status_code != 200:
-		# Retry to generate access token
-		r = generate_access_token_request()
-		if r.status_code != 200:
-			raise MpesaError('Unable to generate access token')
+		raise MpesaError('Unable to generate access token')
 
-	token = r.json()['access_token']
+	payload = json_loads(r.content)
+	token = payload['access_token']
 
-	AccessToken.objects.all().delete()
-	access_token = AccessToken.objects.create(token=token)
+	access_token, _ = AccessToken.objects.update_or_create(
+		pk=AccessToken.SINGLETON_PK,
+		defaults={'token': token, 'created_at': timezone.now()},
+	)
+	access_token.expires_in = int(payload.get('expires_in', _TOKEN_LIFETIME))
 
 	return access_token
 
@@ -162,49 +270,65 @@ def mpesa_access_token():
 	Generate access token if the current one has expired or if token is non-existent
 	Otherwise return existing access token
 
+	The token is kept in process memory; the database is only consulted on a
+	cold start, to pick up a token another worker already generated.
+
 	Returns:
 		str: A valid access token
 	"""
 
-	access_token = AccessToken.objects.first()
-	if access_token == None:
-		# No access token found
-		access_token = generate_access_token()
-	else:
-		delta = timezone.now() - access_token.created_at
-		minutes = (delta.total_seconds()//60)
-		if minutes > 50:
-			# Access token expired
-			access_token = generate_access_token()	
-	
-	return access_token.token
+	if time.monotonic() < _TOKEN_CACHE['expires_at']:
+		return _TOKEN_CACHE['token']
+
+	with _TOKEN_LOCK:
+		# Another thread may have refreshed the token while we waited
+		now = time.monotonic()
+		if now < _TOKEN_CACHE['expires_at']:
+			return _TOKEN_CACHE['token']
+
+		ttl = 0
+		token = None
+		if _TOKEN_CACHE['token'] is None:
+			row = AccessToken.objects.values('token', 'created_at').first()
+			if row is not None:
+				age = (timezone.now() - row['created_at']).total_seconds()
+				ttl = _TOKEN_LIFETIME - _TOKEN_SAFETY_MARGIN - age
+				if ttl > 0:
+					token = row['token']
+
+		if token is None:
+			access_token = generate_access_token()
+			token = access_token.token
+			ttl = access_token.expires_in - _TOKEN_SAFETY_MARGIN
+
+		_TOKEN_CACHE['token'] = token
+		_TOKEN_CACHE['expires_at'] = now + ttl
+
+	return token
 
 def format_phone(phone_number):
     """Format phone number to 2547XXXXXXXX format"""
     if not phone_number:
         return phone_number
         
-    # Remove all non-digit characters except +
-    phone_number = re.sub(r'[^\d+]', '', str(phone_number))
-    
-    # Handle different phone number formats
-    if phone_number.startswith("+"):
-        phone_number = phone_number[1:]
-    if phone_number.startswith("0"):
-        phone_number = "254" + phone_number[1:]
-    elif len(phone_number) == 9 and phone_number.isdigit():
-        phone_number = "254" + phone_number
-    elif phone_number.startswith("7") and len(phone_number) == 9:
-        phone_number = "254" + phone_number
-        
+    # Drop separators and the leading + in one C-level pass
+    phone_number = str(phone_number).translate(_NON_DIGIT_TABLE)
+    if not phone_number.isascii():
+        # Rare non-ASCII input (NBSP, full-width digits...): keep only decimal
+        # digits, transliterated to ASCII, so Daraja always gets [0-9]
+        phone_number = ''.join(str(unicodedata.decimal(c)) for c in phone_number if c.isdecimal())
+
+    # 0XXXXXXXXX -> 254XXXXXXXXX, bare XXXXXXXXX -> 254XXXXXXXXX
+    if phone_number[:1] == "0":
+        return "254" + phone_number[1:]
+    if len(phone_number) == 9:
+        return "254" + phone_number
     return phone_number
 
-def encrypt_security_credential(credential):
+@functools.lru_cache(maxsize=None)
+def _certificate_path():
 	"""
-	Generate an encrypted security credential from a plaintext value
-	
-	Arguments:
-		credential (str) -- The plaintext credential display
+	Path of the public key certificate for the configured environment
 	"""
 
 	mpesa_environment = mpesa_config('MPESA_ENVIRONMENT')
@@ -214,23 +338,46 @@ def encrypt_security_credential(credential):
 	else:
 		raise MpesaConfigurationException('Mpesa environment not configured properly - MPESA_ENVIRONMENT should be sandbox or production')
 
-	certificate_path = os.path.join(settings.BASE_DIR, 'certs', certificate_name)
-	return encrypt_rsa(certificate_path, credential)
+	return os.path.join(settings.BASE_DIR, 'certs', certificate_name)
+
+@functools.lru_cache(maxsize=16)
+def encrypt_security_credential(credential):
+	"""
+	Generate an encrypted security credential from a plaintext value
+
+	The initiator credential is fixed per environment, so the ciphertext is
+	memoized; any valid PKCS#1 v1.5 ciphertext is accepted by Daraja
+	
+	Arguments:
+		credential (str) -- The plaintext credential display
+	"""
+
+	return encrypt_rsa(_certificate_path(), credential)
+
+@functools.lru_cache(maxsize=4)
+def _load_public_key(certificate_path):
+	"""
+	Load the public key from a PEM or DER certificate, parsed once per path.
+	Call _load_public_key.cache_clear() after replacing a certificate on disk.
+	"""
+
+	with open(certificate_path, "rb") as cert_file:
+		cert_data = cert_file.read()
+	try:
+		cert = x509.load_pem_x509_certificate(cert_data)
+	except ValueError:
+		cert = load_der_x509_certificate(cert_data)
+	return cert.public_key()
 
 def encrypt_rsa(certificate_path, input):
 	message = input.encode('ascii')
 	try:
-		with open(certificate_path, "rb") as cert_file:
-			cert_data = cert_file.read()
-			try:
-				cert = x509.load_pem_x509_certificate(cert_data)
-			except ValueError:
-				cert = load_der_x509_certificate(cert_data)
-			try:
-				encrypted = cert.public_key().encrypt(message, PKCS1v15())
-				output = base64.b64encode(encrypted).decode('ascii')
-			except Exception as e:
-				raise ValueError(f"Encryption failed: {str(e)}")
+		public_key = _load_public_key(certificate_path)
+		try:
+			encrypted = public_key.encrypt(message, PKCS1v15())
+			output = binascii.b2a_base64(encrypted, newline=False).decode('ascii')
+		except Exception as e:
+			raise ValueError(f"Encryption failed: {str(e)}")
 	except FileNotFoundError:
 		raise MpesaConfigurationException(f"Certificate file not found: {certificate_path}. Please download the MPESA public key certificate from Safaricom Developer Portal.")
 	except ValueError as e:
@@ -2,33 +2,50 @@ from __future__ import unicode_literals
 from . import utils
 
 from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
 from django.views.generic import View
-from .mpesa import MpesaAPI
+from .models import MpesaRequest
+from .mpesa import get_client
+from .tasks import dispatch
 from decouple import config
 from datetime import datetime
 from django.conf import settings
 
 
-cl = MpesaAPI()
 stk_push_callback_url = 'https://api.darajambili.com/express-payment'
 b2c_callback_url = 'https://api.darajambili.com/b2c/result'
-phone_number = settings.STK_PUSH_PHONE_NUMBER
+
+def _queued(mpesa_request):
+	# The id lets the client poll request_status for the outcome
+	return JsonResponse({'status': 'queued', 'id': str(mpesa_request.pk)}, status=202)
+
+def request_status(request, pk):
+	mpesa_request = get_object_or_404(MpesaRequest, pk=pk)
+	return JsonResponse({
+		'id': str(mpesa_request.pk),
+		'status': mpesa_request.status,
+		'response_code': mpesa_request.response_code,
+		'merchant_request_id': mpesa_request.merchant_request_id,
+		'checkout_request_id': mpesa_request.checkout_request_id,
+		'conversation_id': mpesa_request.conversation_id,
+	})
 
 def index(request):
 
 	return HttpResponse('Welcome to the home of daraja APIs')
 
 def oauth_success(request):
-	r = cl.get_access_token()
+	r = get_client().get_access_token()
 	return JsonResponse(r, safe=False)
 
 def stk_push_success(request):
+	phone_number = settings.STK_PUSH_PHONE_NUMBER
 	amount = 300
 	account_reference ='ovinet'
 	transaction_desc = 'STK Push Description'
 	callback_url = stk_push_callback_url
-	r = cl.stk_push(phone_number, amount, account_reference, transaction_desc, callback_url)
-	return JsonResponse(r.response_description, safe=False)
+	mpesa_request = dispatch('stk_push', phone_number, amount, account_reference, transaction_desc, callback_url)
+	return _queued(mpesa_request)
 
 def business_payment_success(request):
 	phone_number = '0714991603'
@@ -36,8 +53,8 @@ def business_payment_success(request):
 	transaction_desc = 'Business Payment Description'
 	occassion = 'Test business payment occassion'
 	callback_url = b2c_callback_url
-	r = cl.business_payment(phone_number, amount, transaction_desc, callback_url, occassion)
-	return JsonResponse(r.response_description, safe=False)
+	mpesa_request = dispatch('business_payment', phone_number, amount, transaction_desc, callback_url, occassion)
+	return _queued(mpesa_request)
 
 """def customer_refund(request):
 	phone_number = config('B2C_PHONE_NUMBER')
@@ -45,7 +62,7 @@ def business_payment_success(request):
 	transaction_desc = 'Salary Payment Description'
 	occassion = 'Test salary payment occassion'
 	callback_url = b2c_callback_url
-	r = cl.salary_payment(phone_number, amount, transaction_desc, callback_url, occassion)
+	r = get_client().salary_payment(phone_number, amount, transaction_desc, callback_url, occassion)
 	return JsonResponse(r.response_description, safe=False)"""
 
 def promotion_payment_success(request):
@@ -54,5 +71,5 @@ def promotion_payment_success(request):
 	transaction_desc = 'Promotion Payment Description'
 	occassion = 'Test promotion payment occassion'
 	callback_url = b2c_callback_url
-	r = cl.promotion_payment(phone_number, amount, transaction_desc, callback_url, occassion)
-	return JsonResponse(r.response_description, safe=False)
+	mpesa_request = dispatch('promotion_payment', phone_number, amount, transaction_desc, callback_url, occassion)
+	return _queued(mpesa_request)
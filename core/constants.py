@@ -22,4 +22,13 @@ class SessionStatus(models.TextChoices):
     ACTIVE = 'active', 'Active'
     PAUSED = 'paused', 'Paused'
     EXPIRED = 'expired', 'Expired'
-    CANCELLED = 'cancelled', 'Cancelled'
\ No newline at end of file
+    CANCELLED = 'cancelled', 'Cancelled'
+    TERMINATED = 'terminated', 'Terminated'
+
+
+class PauseReason(models.TextChoices):
+    USER_REQUEST = 'user_request', 'User Request'
+    ADMIN_ACTION = 'admin_action', 'Admin Action'
+    SYSTEM_AUTO = 'system_auto', 'System Auto-pause'
+    PAYMENT_ISSUE = 'payment_issue', 'Payment Issue'
+    OTHER = 'other', 'Other'
\ No newline at end of file
@@ -1,13 +1,22 @@
+from types import MappingProxyType
+
 from django.conf import settings
 
+# Settings don't change after startup, so the context is built once per process
+_PLATFORM_CACHE = None
+
+
 def platform_settings(request):
-    return {
-        'PLATFORM': {
-            'NAME': getattr(settings, 'PLATFORM_NAME', 'Ovinet'),
-            'SUPPORT_EMAIL': getattr(settings, 'PLATFORM_SUPPORT_EMAIL', None),
-            'SUPPORT_URL': getattr(settings, 'PLATFORM_SUPPORT_URL', None),
-            'SUPPORT_PHONE': getattr(settings, 'PLATFORM_SUPPORT_PHONE', None),
-            'LOGO_URL': getattr(settings, 'PLATFORM_LOGO_URL', None),
-            'LOGO_ALT': getattr(settings, 'PLATFORM_LOGO_ALT', None),
+    global _PLATFORM_CACHE
+    if _PLATFORM_CACHE is None:
+        _PLATFORM_CACHE = {
+            'PLATFORM': MappingProxyType({
+                'NAME': getattr(settings, 'PLATFORM_NAME', 'Ovinet'),
+                'SUPPORT_EMAIL': getattr(settings, 'PLATFORM_SUPPORT_EMAIL', None),
+                'SUPPORT_URL': getattr(settings, 'PLATFORM_SUPPORT_URL', None),
+                'SUPPORT_PHONE': getattr(settings, 'PLATFORM_SUPPORT_PHONE', None),
+                'LOGO_URL': getattr(settings, 'PLATFORM_LOGO_URL', None),
+                'LOGO_ALT': getattr(settings, 'PLATFORM_LOGO_ALT', None),
+            })
         }
-    }
\ No newline at end of file
+    return _PLATFORM_CACHE
\ No newline at end of file
@@ -5,12 +5,14 @@ from django.utils.html import format_html
 register = template.Library()
 
 
+# The platform name comes from the context processor: {{ PLATFORM.NAME }}
+
+
 @register.simple_tag
-def platform_name():
-    return 'Ovinet'
+def mailto(email):
+    return format_html('<a href="mailto:{}">{}</a>', email, email)
 
 
 @register.simple_tag
-def mailto(email, label=None):
-    label = label or email
+def mailto_labeled(email, label):
     return format_html('<a href="mailto:{}">{}</a>', email, label)
\ No newline at end of file
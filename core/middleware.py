@@ -1,13 +1,31 @@
-from django.utils.deprecation import MiddlewareMixin
 from django.shortcuts import Http404
 
+from . import request_cache
 
-class TenantDetectionMiddleware(MiddlewareMixin):
+
+class TenantDetectionMiddleware:
     """Detect tenant from host and attach to request. In a django-tenants setup
     this would typically be handled by django-tenants middleware; this file
     provides a small helper you can extend.
     """
-    def process_request(self, request):
-        host = request.get_host().split(':')[0]
-        request.tenant_host = host
-        # optionally set request.tenant or similar
\ No newline at end of file
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        host = request.get_host()
+        colon = host.find(':')
+        request.tenant_host = host if colon == -1 else host[:colon]
+        # optionally set request.tenant or similar.
+        return self.get_response(request)
+
+class RequestCacheMiddleware:
+    """Scope core.request_cache memoization to a single request."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_cache.start()
+        try:
+            return self.get_response(request)
+        finally:
+            request_cache.clear()
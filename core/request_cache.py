@@ -0,0 +1,40 @@
+import functools
+import threading
+
+# Per-thread store that RequestCacheMiddleware opens and closes around each
+# request; None outside a request, where decorated functions run uncached.
+_local = threading.local()
+
+
+def start():
+    _local.store = {}
+
+
+def clear():
+    _local.store = None
+
+
+def cache_for_request(fn):
+    """Memoize fn(*args) for the rest of the current request.
+
+    Arguments must be hashable; model instances hash by pk.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args):
+        store = getattr(_local, 'store', None)
+        if store is None:
+            return fn(*args)
+        key = (fn, args)
+        try:
+            return store[key]
+        except KeyError:
+            result = store[key] = fn(*args)
+            return result
+
+    def forget(*args):
+        store = getattr(_local, 'store', None)
+        if store is not None:
+            store.pop((fn, args), None)
+
+    wrapper.forget = forget
+    return wrapper
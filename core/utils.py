@@ -6,11 +6,12 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
 
-PHONE_RE = re.compile(r'^\\+?\d{7,15}$')
+PHONE_RE = re.compile(r'^\+?\d{7,15}$')
+_match_phone = PHONE_RE.match
 
 
 def validate_phone(value):
-    if not PHONE_RE.match(value):
+    if not _match_phone(value):
         raise ValidationError('Enter a valid phone number (international format).')
     
 
@@ -21,12 +22,19 @@ def human_readable_timedelta(td):
     days, rem = divmod(total, 86400)
     hours, rem = divmod(rem, 3600)
     minutes, seconds = divmod(rem, 60)
-    parts = []
-    if days: parts.append(f"{days}d")
-    if hours: parts.append(f"{hours}h")
-    if minutes: parts.append(f"{minutes}m")
-    if seconds and not parts: parts.append(f"{seconds}s")
-    return ' '.join(parts) or '0s'
+    return ''.join((
+        f"{days}d " if days else '',
+        f"{hours}h " if hours else '',
+        f"{minutes}m " if minutes else '',
+        f"{seconds}s" if seconds and not (days or hours or minutes) else '',
+    )).rstrip() or '0s'
+
+
+def today_range(now=None):
+    # half-open [midnight, next midnight) in the current time zone, so
+    # filters stay sargable on datetime indexes unlike __date lookups
+    start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timezone.timedelta(days=1)
 
 
 def cache_get(key, default=None):
@@ -1,16 +1,117 @@
+import asyncio
 import logging
-import traceback
+import queue
+import threading
+import time
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Prefetch
 from django.utils import timezone
+from django_tenants.utils import schema_context
 from librouteros import connect
 from librouteros.exceptions import LibRouterosError
-from .models import ActiveSession, PausedSession, SessionStatus
+from core.constants import PauseReason, SessionStatus
+from tenants.cache import incr_daily_usage
+from tenants.models import ActiveSession, PausedSession, UserSubscription
+from tenants.usage import record_usage
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Authenticated connections kept per (host, port, username), newest first
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+_POOL_SIZE = 8
+_POOL_IDLE_TTL = 5 * 60  # seconds before an idle connection is dropped
+
+# Short enough that dashboards still look live, long enough to share one
+# router scan between the lookups made while rendering a page
+_DEVICES_CACHE_TIMEOUT = 5
+# Installed packages and hotspot setup rarely change on a router
+_CAPABILITIES_CACHE_TIMEOUT = 60 * 60
+
+
+def _close_quietly(api):
+    try:
+        api.close()
+    except Exception:
+        # The socket may already be gone; we only need to forget it
+        pass
+
+
+def _get_pool(key):
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = queue.LifoQueue(maxsize=_POOL_SIZE)
+    return pool
+
+
+def _acquire(host, port, username, password):
+    """
+    Take a live connection from the pool, or log in to the router if none is left.
+    """
+    pool = _get_pool((host, port, username))
+    now = time.monotonic()
+    while True:
+        try:
+            api, released_at = pool.get_nowait()
+        except queue.Empty:
+            break
+        if now - released_at > _POOL_IDLE_TTL:
+            _close_quietly(api)
+            continue
+        try:
+            # Cheap round-trip to make sure the router still answers
+            tuple(api('/system/identity/print'))
+            return api
+        except Exception:
+            _close_quietly(api)
+
+    api = connect(username=username, password=password, host=host, port=port)
+    logger.info("Successfully connected to Mikrotik router at %s", host)
+    return api
+
+
+def _release(host, port, username, api):
+    """
+    Hand a healthy connection back to the pool, closing it if the pool is full.
+    """
+    try:
+        _get_pool((host, port, username)).put_nowait((api, time.monotonic()))
+    except queue.Full:
+        _close_quietly(api)
+
+# Properties requested from RouterOS (.proplist) for device listings, so the
+# router only sends what the device dicts below actually use
+_LEASE_FIELDS = ('mac-address', 'address', 'host-name', 'status', 'expires-after', 'client-id', 'server', 'active')
+_ARP_FIELDS = ('mac-address', 'address', 'interface', 'status')
+_WIRELESS_FIELDS = ('mac-address', 'interface', 'uptime', 'signal-strength', 'tx-rate', 'rx-rate', 'ssid')
+_HOTSPOT_FIELDS = ('mac-address', 'address', 'user', 'uptime', 'idle-time', 'bytes-in', 'bytes-out')
+
+
+def _lease_device(lease):
+    """
+    Build the device dict for a DHCP lease record.
+    MAC addresses are lower-cased once here so lookups can compare directly.
+    """
+    return {
+        'mac_address': lease.get('mac-address', '').lower(),
+        'ip_address': lease.get('address', ''),
+        'hostname': lease.get('host-name', 'Unknown'),
+        'status': lease.get('status', 'unknown'),
+        'expires_at': lease.get('expires-after', ''),
+        'client_id': lease.get('client-id', ''),
+        'server': lease.get('server', ''),
+        'active': lease.get('active', False),
+        'type': 'dhcp'
+    }
+
+
 class MikrotikSessionManager:
     """
     Manages Mikrotik session integration with the billing system.
@@ -32,19 +133,32 @@ class MikrotikSessionManager:
         self.password = password or getattr(settings, 'MIKROTIK_PASSWORD', '')
         self.port = port
         self.connection = None
+        self._capabilities = None
     
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
     @contextmanager
     def mikrotik_connection(self):
         """
         Context manager for Mikrotik connection.
-        Ensures connection is properly closed even if an error occurs.
+        The connection comes from the per-router pool and goes back to it
+        afterwards; it is closed instead when an error leaves it in an
+        unknown state.
         """
         try:
             if not self.connection:
                 self.connect()
             yield
         except Exception as e:
-            logger.error(f"Error in Mikrotik connection context: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Error in Mikrotik connection context: %s", e)
+            if self.connection:
+                _close_quietly(self.connection)
+                self.connection = None
             raise
         finally:
             self.disconnect()
@@ -57,30 +171,33 @@ class MikrotikSessionManager:
             bool: True if connection successful, False otherwise
         """
         try:
-            self.connection = connect(
-                username=self.username,
-                password=self.password,
-                host=self.host,
-                port=self.port
-            )
-            logger.info(f"Successfully connected to Mikrotik router at {self.host}")
+            self.connection = _acquire(self.host, self.port, self.username, self.password)
             return True
         except LibRouterosError as e:
-            logger.error(f"Failed to connect to Mikrotik router: {str(e)}")
+            logger.error("Failed to connect to Mikrotik router: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error connecting to Mikrotik router: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error connecting to Mikrotik router: %s", e)
             return False
     
     def disconnect(self):
         """
-        Close connection to Mikrotik router.
+        Return the connection to the pool for the next caller.
         """
         if self.connection:
-            self.connection.close()
+            _release(self.host, self.port, self.username, self.connection)
             self.connection = None
-            logger.info("Disconnected from Mikrotik router")
         return True
+
+    close = disconnect
+    
+    @property
+    def _devices_cache_key(self):
+        return f"mk:devices:{self.host}"
+
+    @property
+    def _devices_by_mac_cache_key(self):
+        return f"mk:devices_by_mac:{self.host}"
     
     def create_session(self, session_id, username, password, data_limit_mb=None, 
                       upload_speed_mbps=None, download_speed_mbps=None):
@@ -127,17 +244,46 @@ class MikrotikSessionManager:
                 # If you want to enforce a data cap, you need to use Mikrotik's scripting
                 # or radius accounting, as queues alone do not cap data.
                 
-                queue_path.add(**queue_config)
+                queue_id = queue_path.add(**queue_config)
+                # Remember the queue's .id so pause/resume/terminate can address it directly
+                ActiveSession.objects.filter(id=session_id).update(mikrotik_queue_id=queue_id)
+                UserSubscription.increment_connections(
+                    ActiveSession.all_objects.filter(id=session_id).values('subscription_id')[:1]
+                )
                 
-                logger.info(f"Created Mikrotik session for user {username} (session ID: {session_id}) with speeds: {download_speed_mbps}M/{upload_speed_mbps}M")
+                logger.info("Created Mikrotik session for user %s (session ID: %s) with speeds: %sM/%sM", username, session_id, download_speed_mbps, upload_speed_mbps)
                 return True
         except LibRouterosError as e:
-            logger.error(f"Failed to create Mikrotik session for user {username}: {str(e)}")
+            logger.error("Failed to create Mikrotik session for user %s: %s", username, e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error creating Mikrotik session for user {username}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error creating Mikrotik session for user %s: %s", username, e)
             return False
     
+    def _for_each_session_queue(self, queue_path, session_id, queue_id, action):
+        """
+        Call action(queue .id) for the simple queue(s) belonging to a session.
+        
+        Uses the .id stored on the session when there is one, and only scans
+        queues by name when it is missing or no longer exists on the router.
+        
+        Returns:
+            bool: True if at least one queue was found
+        """
+        if queue_id:
+            try:
+                action(queue_id)
+                return True
+            except LibRouterosError:
+                # Queue was removed or recreated on the router; look it up by name
+                pass
+        
+        found = False
+        for queue in queue_path.select().where(name__contains=f"session-{session_id}"):
+            found = True
+            action(queue['.id'])
+        return found
+    
     def update_session_data(self, session_id, username, data_used_mb):
         """
         Update session data usage on Mikrotik router.
@@ -152,28 +298,50 @@ class MikrotikSessionManager:
         """
         try:
             with self.mikrotik_connection():
-                # Update data usage in our database
-                try:
-                    session = ActiveSession.objects.get(id=session_id)
-                    session.data_used_mb = data_used_mb
-                    session.save()
+                # data_used_mb is the router's running counter; lock the row so the
+                # delta against the stored reading is counted exactly once
+                with transaction.atomic():
+                    previous = ActiveSession.objects.select_for_update().filter(
+                        id=session_id
+                    ).values('data_used_mb', 'user_id', 'subscription_id', 'start_time').first()
+                    if previous is None:
+                        logger.error("ActiveSession with ID %s does not exist", session_id)
+                        return False
                     
-                    # Update subscription data usage
-                    if session.subscription:
-                        session.subscription.data_used_mb += data_used_mb
-                        session.subscription.save()
+                    if data_used_mb == previous['data_used_mb']:
+                        logger.debug("No new usage for session %s: %s MB", session_id, data_used_mb)
+                        return True
                     
-                    logger.info(f"Updated data usage for session {session_id}: {data_used_mb} MB")
-                except ActiveSession.DoesNotExist:
-                    logger.error(f"ActiveSession with ID {session_id} does not exist")
-                    return False
+                    if data_used_mb > previous['data_used_mb']:
+                        delta_mb = data_used_mb - previous['data_used_mb']
+                    else:
+                        # The RouterOS counter went backwards: the router rebooted or
+                        # the queue was re-created, so everything reported since is new
+                        logger.info("Usage counter reset for session %s: %s MB after %s MB",
+                                    session_id, data_used_mb, previous['data_used_mb'])
+                        delta_mb = data_used_mb
+                    
+                    ActiveSession.objects.filter(id=session_id).update(data_used_mb=data_used_mb)
+                    if not delta_mb:
+                        return True
+                    # The subscription counter is buffered and added in SQL by a
+                    # batched flush; the daily counter is keyed by the session's
+                    # start day to match the SQL fallback in get_daily_usage
+                    def count_usage():
+                        record_usage(previous['subscription_id'], delta_mb)
+                        incr_daily_usage(
+                            previous['user_id'], delta_mb, timezone.localdate(previous['start_time'])
+                        )
+                    transaction.on_commit(count_usage)
+                
+                logger.info("Updated data usage for session %s: %s MB", session_id, data_used_mb)
                 
                 # Here you could also update Mikrotik-specific data tracking if needed
                 # For example, updating counters or sending notifications
                 
                 return True
         except Exception as e:
-            logger.error(f"Failed to update session data for session {session_id}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Failed to update session data for session %s: %s", session_id, e)
             return False
     
     def terminate_session(self, session_id, username):
@@ -193,42 +361,79 @@ class MikrotikSessionManager:
                 user_path = self.connection.path('/user')
                 users = user_path.select().where(name=username)
                 
-                # Check if users exist before trying to remove them
-                users_list = list(users)
-                if users_list:
-                    for user in users_list:
-                        user_path.remove(user['.id'])
-                    logger.info(f"Removed user {username} from Mikrotik")
+                found = False
+                for user in users:
+                    found = True
+                    user_path.remove(user['.id'])
+                if found:
+                    logger.info("Removed user %s from Mikrotik", username)
                 else:
-                    logger.warning(f"User {username} not found on Mikrotik")
+                    logger.warning("User %s not found on Mikrotik", username)
                 
                 # Remove associated queue if it exists
+                session = ActiveSession.objects.filter(id=session_id).first()
                 queue_path = self.connection.path('/queue/simple')
-                queues = queue_path.select().where(name__contains=f"session-{session_id}")
-                
-                # Check if queues exist before trying to remove them
-                queues_list = list(queues)
-                if queues_list:
-                    for queue in queues_list:
-                        queue_path.remove(queue['.id'])
-                    logger.info(f"Removed queue for session {session_id} from Mikrotik")
+                if self._for_each_session_queue(
+                    queue_path, session_id, session.mikrotik_queue_id if session else None, queue_path.remove
+                ):
+                    logger.info("Removed queue for session %s from Mikrotik", session_id)
                 else:
-                    logger.warning(f"Queue for session {session_id} not found on Mikrotik")
+                    logger.warning("Queue for session %s not found on Mikrotik", session_id)
                 
                 # Update session status in database
-                try:
-                    session = ActiveSession.objects.get(id=session_id)
+                if session is not None:
                     session.terminate_session()
-                    logger.info(f"Terminated session {session_id} for user {username}")
-                except ActiveSession.DoesNotExist:
-                    logger.warning(f"ActiveSession with ID {session_id} does not exist in database")
+                    logger.info("Terminated session %s for user %s", session_id, username)
+                else:
+                    logger.warning("ActiveSession with ID %s does not exist in database", session_id)
                 
                 return True
         except LibRouterosError as e:
-            logger.error(f"Failed to terminate Mikrotik session for user {username}: {str(e)}")
+            logger.error("Failed to terminate Mikrotik session for user %s: %s", username, e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error terminating Mikrotik session for user {username}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error terminating Mikrotik session for user %s: %s", username, e)
+            return False
+    
+    def bulk_terminate(self, sessions):
+        """
+        Terminate many user sessions over a single router connection.
+        
+        Users and queues are each listed once and matched locally, instead of
+        one lookup per session, and the database is updated in one statement.
+        
+        Args:
+            sessions (iterable): (session_id, username) pairs
+            
+        Returns:
+            bool: True if all sessions were processed, False otherwise
+        """
+        sessions = list(sessions)
+        if not sessions:
+            return True
+        try:
+            with self.mikrotik_connection():
+                usernames = {username for _, username in sessions}
+                user_path = self.connection.path('/user')
+                for user in user_path.select('.id', 'name'):
+                    if user.get('name') in usernames:
+                        user_path.remove(user['.id'])
+                
+                # Queues are named "session-<id>-<username>"
+                prefixes = tuple(f"session-{session_id}-" for session_id, _ in sessions)
+                queue_path = self.connection.path('/queue/simple')
+                for queue in queue_path.select('.id', 'name'):
+                    if queue.get('name', '').startswith(prefixes):
+                        queue_path.remove(queue['.id'])
+                
+                ActiveSession.terminate_where(id__in=[session_id for session_id, _ in sessions])
+                logger.info("Terminated %s sessions on Mikrotik", len(sessions))
+                return True
+        except LibRouterosError as e:
+            logger.error("Failed to bulk terminate Mikrotik sessions: %s", e)
+            return False
+        except Exception as e:
+            logger.exception("Unexpected error bulk terminating Mikrotik sessions: %s", e)
             return False
     
     def pause_session(self, session_id, username, pause_reason=None, user=None):
@@ -246,52 +451,54 @@ class MikrotikSessionManager:
         """
         try:
             with self.mikrotik_connection():
-                # Get the session
-                try:
-                    session = ActiveSession.objects.get(id=session_id)
-                except ActiveSession.DoesNotExist:
-                    logger.error(f"ActiveSession with ID {session_id} does not exist")
+                # Only the columns needed to decide and to address the queue
+                session = ActiveSession.objects.filter(id=session_id).values(
+                    'session_status', 'mikrotik_queue_id'
+                ).first()
+                if session is None:
+                    logger.error("ActiveSession with ID %s does not exist", session_id)
                     return False
                 
-                if session.is_paused:
-                    logger.warning(f"Session {session_id} is already paused")
+                if session['session_status'] != SessionStatus.ACTIVE:
+                    logger.warning("Session %s is not active", session_id)
                     return False
                 
                 # Disable the user's queue to pause bandwidth
                 queue_path = self.connection.path('/queue/simple')
-                queues = queue_path.select().where(name__contains=f"session-{session_id}")
-                
-                # Check if queues exist before trying to modify them
-                queues_list = list(queues)
-                if queues_list:
-                    for queue in queues_list:
-                        queue_path.set(
-                            queue['.id'],
-                            **{'disabled': 'true'}
-                        )
-                    logger.info(f"Disabled queue for session {session_id} on Mikrotik")
+                if self._for_each_session_queue(
+                    queue_path, session_id, session['mikrotik_queue_id'],
+                    lambda queue_id: queue_path.set(queue_id, **{'disabled': 'true'})
+                ):
+                    logger.info("Disabled queue for session %s on Mikrotik", session_id)
                 else:
-                    logger.warning(f"Queue for session {session_id} not found on Mikrotik")
-                
-                # Update session status
-                session.pause_session()
+                    logger.warning("Queue for session %s not found on Mikrotik", session_id)
                 
-                # Create pause history record
-                PausedSession.objects.create(
-                    session=session,
-                    pause_reason='user_request' if not pause_reason else 'admin_action',
-                    pause_description=pause_reason or 'Session paused',
-                    paused_by=user
-                )
+                with transaction.atomic():
+                    # Update session status (same transition as ActiveSession.pause_session);
+                    # a concurrent pause or terminate makes this a no-op
+                    updated = ActiveSession.objects.filter(
+                        id=session_id, session_status=SessionStatus.ACTIVE
+                    ).update(session_status=SessionStatus.PAUSED)
+                    if not updated:
+                        logger.warning("Session %s is no longer active", session_id)
+                        return False
+                    
+                    # Create pause history record
+                    PausedSession.objects.create(
+                        session_id=session_id,
+                        pause_reason=PauseReason.USER_REQUEST if not pause_reason else PauseReason.ADMIN_ACTION,
+                        pause_description=pause_reason or 'Session paused',
+                        paused_by=user
+                    )
                 
-                logger.info(f"Paused session {session_id} for user {username}")
+                logger.info("Paused session %s for user %s", session_id, username)
                 return True
                 
         except LibRouterosError as e:
-            logger.error(f"Failed to pause Mikrotik session for user {username}: {str(e)}")
+            logger.error("Failed to pause Mikrotik session for user %s: %s", username, e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error pausing Mikrotik session for user {username}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error pausing Mikrotik session for user %s: %s", username, e)
             return False
     
     def resume_session(self, session_id, username):
@@ -307,53 +514,47 @@ class MikrotikSessionManager:
         """
         try:
             with self.mikrotik_connection():
-                # Get the session
-                try:
-                    session = ActiveSession.objects.get(id=session_id)
-                except ActiveSession.DoesNotExist:
-                    logger.error(f"ActiveSession with ID {session_id} does not exist")
+                # Only the columns needed to decide and to address the queue
+                session = ActiveSession.objects.filter(id=session_id).values(
+                    'session_status', 'mikrotik_queue_id'
+                ).first()
+                if session is None:
+                    logger.error("ActiveSession with ID %s does not exist", session_id)
                     return False
                 
-                if not session.is_paused:
-                    logger.warning(f"Session {session_id} is not paused")
+                if session['session_status'] != SessionStatus.PAUSED:
+                    logger.warning("Session %s is not paused", session_id)
                     return False
                 
                 # Enable the user's queue to resume bandwidth
                 queue_path = self.connection.path('/queue/simple')
-                queues = queue_path.select().where(name__contains=f"session-{session_id}")
-                
-                # Check if queues exist before trying to modify them
-                queues_list = list(queues)
-                if queues_list:
-                    for queue in queues_list:
-                        queue_path.set(
-                            queue['.id'],
-                            **{'disabled': 'false'}
-                        )
-                    logger.info(f"Enabled queue for session {session_id} on Mikrotik")
+                if self._for_each_session_queue(
+                    queue_path, session_id, session['mikrotik_queue_id'],
+                    lambda queue_id: queue_path.set(queue_id, **{'disabled': 'false'})
+                ):
+                    logger.info("Enabled queue for session %s on Mikrotik", session_id)
                 else:
-                    logger.warning(f"Queue for session {session_id} not found on Mikrotik")
+                    logger.warning("Queue for session %s not found on Mikrotik", session_id)
                 
-                # Update session status
-                session.resume_session()
+                # Update session status (same transition as ActiveSession.resume_session)
+                ActiveSession.objects.filter(id=session_id, session_status=SessionStatus.PAUSED).update(
+                    session_status=SessionStatus.ACTIVE
+                )
                 
-                # Update the latest pause history record
-                latest_pause = PausedSession.objects.filter(
-                    session=session,
+                # Close the open pause history record in the same way
+                PausedSession.objects.filter(
+                    session_id=session_id,
                     resumed_at__isnull=True
-                ).first()
-                
-                if latest_pause:
-                    latest_pause.resume()
+                ).update(resumed_at=timezone.now())
                 
-                logger.info(f"Resumed session {session_id} for user {username}")
+                logger.info("Resumed session %s for user %s", session_id, username)
                 return True
                 
         except LibRouterosError as e:
-            logger.error(f"Failed to resume Mikrotik session for user {username}: {str(e)}")
+            logger.error("Failed to resume Mikrotik session for user %s: %s", username, e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error resuming Mikrotik session for user {username}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error resuming Mikrotik session for user %s: %s", username, e)
             return False
     
     def get_session_status(self, session_id):
@@ -367,7 +568,7 @@ class MikrotikSessionManager:
             dict: Session status information or None if error
         """
         try:
-            session = ActiveSession.objects.get(id=session_id)
+            session = ActiveSession.objects.select_related('user', 'subscription').get(id=session_id)
             
             status = {
                 'session_id': session.id,
@@ -376,28 +577,79 @@ class MikrotikSessionManager:
                 'is_paused': session.is_paused,
                 'data_used_mb': session.data_used_mb,
                 'start_time': session.start_time,
-                'pause_history': []
             }
             
-            # Get pause history
-            pause_history = PausedSession.objects.filter(session=session)[:5]
-            for pause in pause_history:
-                status['pause_history'].append({
-                    'paused_at': pause.paused_at,
-                    'resumed_at': pause.resumed_at,
-                    'pause_duration': pause.pause_duration,
-                    'pause_reason': pause.pause_reason
-                })
+            # Last five pauses in one query; pause_duration is a model property,
+            # so derive it from the fetched timestamps
+            now = timezone.now()
+            pause_history = PausedSession.objects.filter(session_id=session_id).order_by('-paused_at').values(
+                'paused_at', 'resumed_at', 'pause_reason'
+            )[:5]
+            status['pause_history'] = [
+                {
+                    'paused_at': pause['paused_at'],
+                    'resumed_at': pause['resumed_at'],
+                    'pause_duration': (pause['resumed_at'] or now) - pause['paused_at'],
+                    'pause_reason': pause['pause_reason'],
+                }
+                for pause in pause_history
+            ]
             
             return status
             
         except ActiveSession.DoesNotExist:
-            logger.error(f"ActiveSession with ID {session_id} does not exist")
+            logger.error("ActiveSession with ID %s does not exist", session_id)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error getting session status for {session_id}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error getting session status for %s: %s", session_id, e)
             return None
     
+    @classmethod
+    def bulk_session_status(cls, session_ids):
+        """
+        Get the status of many sessions at once, for dashboards listing sessions.
+        
+        Loads sessions and their five most recent pauses in two queries,
+        instead of the two per session that get_session_status costs.
+        
+        Args:
+            session_ids (iterable): IDs of the ActiveSessions in the database
+            
+        Returns:
+            dict: Session status information (as in get_session_status) keyed by session ID
+        """
+        sessions = ActiveSession.objects.filter(id__in=session_ids).select_related(
+            'user', 'subscription'
+        ).prefetch_related(
+            Prefetch(
+                'pause_history',
+                queryset=PausedSession.objects.order_by('-paused_at')[:5],
+                to_attr='recent_pauses'
+            )
+        )
+        
+        now = timezone.now()
+        return {
+            session.id: {
+                'session_id': session.id,
+                'username': session.user.phone_number,
+                'is_active': session.is_active,
+                'is_paused': session.is_paused,
+                'data_used_mb': session.data_used_mb,
+                'start_time': session.start_time,
+                'pause_history': [
+                    {
+                        'paused_at': pause.paused_at,
+                        'resumed_at': pause.resumed_at,
+                        'pause_duration': (pause.resumed_at or now) - pause.paused_at,
+                        'pause_reason': pause.pause_reason,
+                    }
+                    for pause in session.recent_pauses
+                ],
+            }
+            for session in sessions
+        }
+    
     def get_user_stats(self, username):
         """
         Get user statistics from Mikrotik router.
@@ -414,121 +666,193 @@ class MikrotikSessionManager:
                 user_path = self.connection.path('/user')
                 users = user_path.select().where(name=username)
                 
-                # Check if users exist
-                users_list = list(users)
-                if users_list:
-                    user = users_list[0]  # Get the first user (should be only one)
+                # Only the first match is needed (there should be only one)
+                user = next(iter(users), None)
+                if user is not None:
                     return {
                         'username': user['name'],
                         'active': user.get('active', False),
                         'last_logged_in': user.get('last-logged-in', None),
                     }
                 
-                logger.warning(f"User {username} not found on Mikrotik router")
+                logger.warning("User %s not found on Mikrotik router", username)
                 return None
         except LibRouterosError as e:
-            logger.error(f"Failed to get user stats for {username}: {str(e)}")
+            logger.error("Failed to get user stats for %s: %s", username, e)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error getting user stats for {username}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error getting user stats for %s: %s", username, e)
             return None
     
+    def get_capabilities(self):
+        """
+        Find out once whether the router has wireless interfaces and a hotspot.
+        
+        Must be called with an open connection. The answer is kept on the
+        instance and in the cache per router, so routers without these
+        features don't pay for failing queries on every device scan.
+        
+        Returns:
+            dict: {'wireless': bool, 'hotspot': bool}
+        """
+        if self._capabilities is None:
+            key = f"mk:capabilities:{self.host}"
+            capabilities = cache.get(key)
+            if capabilities is None:
+                capabilities = {
+                    'wireless': self._has_entries('/interface/wireless'),
+                    'hotspot': self._has_entries('/ip/hotspot'),
+                }
+                cache.set(key, capabilities, _CAPABILITIES_CACHE_TIMEOUT)
+            self._capabilities = capabilities
+        return self._capabilities
+    
+    def _has_entries(self, path):
+        """
+        True if the menu exists on the router and has at least one entry.
+        """
+        try:
+            return next(iter(self.connection.path(path).select('.id')), None) is not None
+        except LibRouterosError as e:
+            logger.debug("%s not available on Mikrotik: %s", path, e)
+            return False
+    
+    def _iter_devices(self):
+        """
+        Yield device dicts one at a time. Must be called with an open connection.
+        
+        ARP and wireless entries are indexed first (they are small); leases
+        and hotspot users are then turned into devices as they are read.
+        """
+        # Get DHCP leases (active connections)
+        dhcp_path = self.connection.path('/ip/dhcp-server/lease')
+        leases = dhcp_path.select(*_LEASE_FIELDS)
+        
+        # Get ARP table for additional device info
+        arp_path = self.connection.path('/ip/arp')
+        arp_entries = arp_path.select(*_ARP_FIELDS)
+        
+        capabilities = self.get_capabilities()
+        
+        # Get wireless registrations if wireless is enabled
+        wireless_clients = ()
+        if capabilities['wireless']:
+            wireless_path = self.connection.path('/interface/wireless/registration-table')
+            try:
+                wireless_clients = tuple(wireless_path.select(*_WIRELESS_FIELDS))
+            except Exception as e:
+                # Wireless might not be enabled, skip wireless clients
+                logger.debug("Wireless interface not available or enabled: %s", e)
+        
+        # Index ARP and wireless entries by MAC; the first entry wins,
+        # as it did with the old linear scans
+        arp_by_mac = {}
+        for arp in arp_entries:
+            arp_by_mac.setdefault(arp.get('mac-address', '').lower(), arp)
+        wifi_by_mac = {}
+        for client in wireless_clients:
+            wifi_by_mac.setdefault(client.get('mac-address', '').lower(), client)
+        
+        # Process DHCP leases
+        for lease in leases:
+            device = _lease_device(lease)
+            
+            # Matching ARP entry for additional info
+            arp = arp_by_mac.get(device['mac_address'])
+            if arp is not None:
+                device['interface'] = arp.get('interface', '')
+                device['arp_status'] = arp.get('status', '')
+            
+            # Matching wireless client
+            client = wifi_by_mac.get(device['mac_address'])
+            if client is not None:
+                device['wireless_info'] = {
+                    'interface': client.get('interface', ''),
+                    'uptime': client.get('uptime', ''),
+                    'signal_strength': client.get('signal-strength', ''),
+                    'tx_rate': client.get('tx-rate', ''),
+                    'rx_rate': client.get('rx-rate', ''),
+                    'ssid': client.get('ssid', '')
+                }
+                device['type'] = 'wireless'
+            
+            yield device
+        
+        # Also get active hotspot users if hotspot is enabled
+        if capabilities['hotspot']:
+            try:
+                hotspot_path = self.connection.path('/ip/hotspot/active')
+                hotspot_users = hotspot_path.select(*_HOTSPOT_FIELDS)
+                
+                for user in hotspot_users:
+                    device = {
+                        'mac_address': user.get('mac-address', '').lower(),
+                        'ip_address': user.get('address', ''),
+                        'username': user.get('user', ''),
+                        'uptime': user.get('uptime', ''),
+                        'idle_time': user.get('idle-time', ''),
+                        'bytes_in': user.get('bytes-in', 0),
+                        'bytes_out': user.get('bytes-out', 0),
+                        'type': 'hotspot'
+                    }
+                    yield device
+            except Exception as e:
+                # Hotspot might not be enabled, skip hotspot users
+                logger.debug("Hotspot interface not available or enabled: %s", e)
+    
+    def iter_connected_devices(self, chunk_size=100):
+        """
+        Yield connected devices in lists of up to chunk_size, without building
+        the full device list. Bypasses the device cache.
+        
+        Args:
+            chunk_size (int): Maximum number of devices per yielded list
+            
+        Yields:
+            list: Device dicts, as returned by get_connected_devices
+        """
+        with self.mikrotik_connection():
+            chunk = []
+            for device in self._iter_devices():
+                chunk.append(device)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+    
     def get_connected_devices(self):
         """
         Get all connected devices with their MAC addresses and IP addresses.
         
+        Results are cached per router for a few seconds.
+        
         Returns:
             list: List of connected devices with MAC addresses, IP addresses, and other details
         """
+        devices = cache.get(self._devices_cache_key)
+        if devices is not None:
+            return devices
         try:
             with self.mikrotik_connection():
-                # Get DHCP leases (active connections)
-                dhcp_path = self.connection.path('/ip/dhcp-server/lease')
-                leases = dhcp_path.select()
+                devices = list(self._iter_devices())
                 
-                # Get ARP table for additional device info
-                arp_path = self.connection.path('/ip/arp')
-                arp_entries = arp_path.select()
-                
-                # Get wireless registrations if wireless is enabled
-                wireless_path = self.connection.path('/interface/wireless/registration-table')
-                wireless_clients = []
-                try:
-                    wireless_clients = wireless_path.select()
-                except Exception as e:
-                    # Wireless might not be enabled, skip wireless clients
-                    logger.debug(f"Wireless interface not available or enabled: {str(e)}")
-                    pass
-                
-                devices = []
-                
-                # Process DHCP leases
-                for lease in leases:
-                    device = {
-                        'mac_address': lease.get('mac-address', ''),
-                        'ip_address': lease.get('address', ''),
-                        'hostname': lease.get('host-name', 'Unknown'),
-                        'status': lease.get('status', 'unknown'),
-                        'expires_at': lease.get('expires-after', ''),
-                        'client_id': lease.get('client-id', ''),
-                        'server': lease.get('server', ''),
-                        'active': lease.get('active', False),
-                        'type': 'dhcp'
-                    }
-                    
-                    # Find matching ARP entry for additional info
-                    for arp in arp_entries:
-                        if arp.get('mac-address') == device['mac_address']:
-                            device['interface'] = arp.get('interface', '')
-                            device['arp_status'] = arp.get('status', '')
-                            break
-                    
-                    # Find matching wireless client
-                    for client in wireless_clients:
-                        if client.get('mac-address') == device['mac_address']:
-                            device['wireless_info'] = {
-                                'interface': client.get('interface', ''),
-                                'uptime': client.get('uptime', ''),
-                                'signal_strength': client.get('signal-strength', ''),
-                                'tx_rate': client.get('tx-rate', ''),
-                                'rx_rate': client.get('rx-rate', ''),
-                                'ssid': client.get('ssid', '')
-                            }
-                            device['type'] = 'wireless'
-                            break
-                    
-                    devices.append(device)
-                
-                # Also get active hotspot users if hotspot is enabled
-                try:
-                    hotspot_path = self.connection.path('/ip/hotspot/active')
-                    hotspot_users = hotspot_path.select()
-                    
-                    for user in hotspot_users:
-                        device = {
-                            'mac_address': user.get('mac-address', ''),
-                            'ip_address': user.get('address', ''),
-                            'username': user.get('user', ''),
-                            'uptime': user.get('uptime', ''),
-                            'idle_time': user.get('idle-time', ''),
-                            'bytes_in': user.get('bytes-in', 0),
-                            'bytes_out': user.get('bytes-out', 0),
-                            'type': 'hotspot'
-                        }
-                        devices.append(device)
-                except Exception as e:
-                    # Hotspot might not be enabled, skip hotspot users
-                    logger.debug(f"Hotspot interface not available or enabled: {str(e)}")
-                    pass
-                
-                logger.info(f"Retrieved {len(devices)} connected devices from Mikrotik")
+                logger.info("Retrieved %s connected devices from Mikrotik", len(devices))
+                # First entry per MAC wins, matching the old linear search
+                by_mac = {}
+                for device in devices:
+                    by_mac.setdefault(device['mac_address'], device)
+                cache.set_many({
+                    self._devices_cache_key: devices,
+                    self._devices_by_mac_cache_key: by_mac,
+                }, _DEVICES_CACHE_TIMEOUT)
                 return devices
                 
         except LibRouterosError as e:
-            logger.error(f"Failed to get connected devices from Mikrotik: {str(e)}")
+            logger.error("Failed to get connected devices from Mikrotik: %s", e)
             return []
         except Exception as e:
-            logger.error(f"Unexpected error getting connected devices: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error getting connected devices: %s", e)
             return []
     
     def get_device_by_mac(self, mac_address):
@@ -541,19 +865,67 @@ class MikrotikSessionManager:
         Returns:
             dict: Device information or None if not found
         """
+        target = mac_address.lower()
         try:
-            devices = self.get_connected_devices()
+            by_mac = cache.get(self._devices_by_mac_cache_key)
+            if by_mac is not None:
+                device = by_mac.get(target)
+                if device is not None:
+                    return device
             
-            for device in devices:
-                if device['mac_address'].lower() == mac_address.lower():
+            # Ask the router for just this MAC before falling back to a full scan
+            device = self._lookup_device(mac_address)
+            if device is not None:
+                return device
+            
+            if by_mac is None:
+                self.get_connected_devices()
+                device = (cache.get(self._devices_by_mac_cache_key) or {}).get(target)
+                if device is not None:
                     return device
             
-            logger.warning(f"Device with MAC address {mac_address} not found")
+            logger.warning("Device with MAC address %s not found", mac_address)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error getting device by MAC address {mac_address}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error getting device by MAC address %s: %s", mac_address, e)
             return None
     
+    def _lookup_device(self, mac_address):
+        """
+        Filter DHCP leases and the ARP table on the router for one MAC address.
+        
+        Args:
+            mac_address (str): MAC address to search for
+            
+        Returns:
+            dict: Device information or None if the router has no lease or ARP entry
+        """
+        # RouterOS stores MAC addresses upper-case and compares them exactly
+        mac_address = mac_address.upper()
+        with self.mikrotik_connection():
+            lease = next(iter(
+                self.connection.path('/ip/dhcp-server/lease').select(*_LEASE_FIELDS).where(**{'mac-address': mac_address})
+            ), None)
+            arp = next(iter(
+                self.connection.path('/ip/arp').select(*_ARP_FIELDS).where(**{'mac-address': mac_address})
+            ), None)
+        
+        if lease is not None:
+            device = _lease_device(lease)
+        elif arp is not None:
+            device = {
+                'mac_address': arp.get('mac-address', '').lower(),
+                'ip_address': arp.get('address', ''),
+                'type': 'arp'
+            }
+        else:
+            return None
+        
+        if arp is not None:
+            device['interface'] = arp.get('interface', '')
+            device['arp_status'] = arp.get('status', '')
+        return device
+    
     def get_devices_by_interface(self, interface_name):
         """
         Get all devices connected to a specific interface.
@@ -576,9 +948,92 @@ class MikrotikSessionManager:
             
             return interface_devices
         except Exception as e:
-            logger.error(f"Unexpected error getting devices by interface {interface_name}: {str(e)}\n{traceback.format_exc()}")
+            logger.exception("Unexpected error getting devices by interface %s: %s", interface_name, e)
             return []
 
+class AsyncMikrotikSessionManager:
+    """
+    asyncio front-end for MikrotikSessionManager, for batch jobs that need
+    to fan out many router calls at once.
+
+    librouteros has no async client, so every call runs a fresh (pool-backed)
+    MikrotikSessionManager in a worker thread. A semaphore bounds how many
+    calls hit the router concurrently.
+    """
+
+    def __init__(self, host=None, username=None, password=None, port=8728, max_concurrency=4):
+        """
+        Args:
+            host, username, password, port: As for MikrotikSessionManager
+            max_concurrency (int): Maximum concurrent RouterOS calls to this router
+        """
+        self.host = host or getattr(settings, 'MIKROTIK_HOST', '192.168.88.1')
+        self.username = username or getattr(settings, 'MIKROTIK_USERNAME', 'admin')
+        self.password = password or getattr(settings, 'MIKROTIK_PASSWORD', '')
+        self.port = port
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _call(self, method, *args, **kwargs):
+        # Worker threads get their own DB connection, so carry the tenant over
+        schema_name = connection.schema_name
+
+        def run():
+            try:
+                with schema_context(schema_name):
+                    manager = MikrotikSessionManager(self.host, self.username, self.password, self.port)
+                    return getattr(manager, method)(*args, **kwargs)
+            finally:
+                close_old_connections()
+
+        async with self._semaphore:
+            return await sync_to_async(run, thread_sensitive=False)()
+
+    async def create_session(self, *args, **kwargs):
+        return await self._call('create_session', *args, **kwargs)
+
+    async def terminate_session(self, session_id, username):
+        return await self._call('terminate_session', session_id, username)
+
+    async def pause_session(self, *args, **kwargs):
+        return await self._call('pause_session', *args, **kwargs)
+
+    async def resume_session(self, session_id, username):
+        return await self._call('resume_session', session_id, username)
+
+    async def get_user_stats(self, username):
+        return await self._call('get_user_stats', username)
+
+    async def get_connected_devices(self):
+        return await self._call('get_connected_devices')
+
+    async def terminate_sessions(self, sessions):
+        """
+        Terminate many sessions concurrently.
+
+        Args:
+            sessions (iterable): (session_id, username) pairs
+
+        Returns:
+            list: One bool per session, in input order
+        """
+        return await asyncio.gather(*(
+            self.terminate_session(session_id, username) for session_id, username in sessions
+        ))
+
+
+_local = threading.local()
+
+
+def get_manager():
+    """
+    Return this thread's MikrotikSessionManager for the configured router.
+    librouteros connections are not thread-safe, so each thread keeps its own.
+    """
+    manager = getattr(_local, 'manager', None)
+    if manager is None:
+        manager = _local.manager = MikrotikSessionManager()
+    return manager
+
 # Example usage:
 # mikrotik_manager = MikrotikSessionManager(
 #     host='192.168.88.1',
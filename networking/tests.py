@@ -1,3 +1,127 @@
-from django.test import TestCase
+from contextlib import nullcontext
+from unittest import mock
 
-# Create your tests here.
+from core.constants import SessionStatus
+from tenants.models import ActiveSession, PausedSession, UserSubscription
+from tenants.selectors import get_daily_usage
+from tenants.tests import VendorTenantTestCase
+from .mikrotik import MikrotikSessionManager
+
+
+@mock.patch.object(MikrotikSessionManager, 'mikrotik_connection', lambda self: nullcontext())
+class MikrotikSessionManagerTests(VendorTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('0712000101')
+        self.subscription = UserSubscription.create_for(self.user, self.make_package())
+        self.session = ActiveSession.objects.create(user=self.user, subscription=self.subscription)
+        self.manager = MikrotikSessionManager(host='router.test')
+        self.manager.connection = mock.MagicMock()
+
+    def report(self, data_used_mb):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.manager.update_session_data(self.session.pk, 'user', data_used_mb)
+
+    @mock.patch('networking.mikrotik.record_usage')
+    def test_update_session_data_counts_only_the_delta(self, record_usage):
+        get_daily_usage(self.user)  # seed the daily counter
+
+        self.assertTrue(self.report(100))
+        self.assertTrue(self.report(150))
+
+        self.assertEqual(
+            record_usage.call_args_list,
+            [mock.call(self.subscription.pk, 100), mock.call(self.subscription.pk, 50)],
+        )
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.data_used_mb, 150)
+        self.assertEqual(get_daily_usage(self.user), 150)
+
+    @mock.patch('networking.mikrotik.incr_daily_usage')
+    @mock.patch('networking.mikrotik.record_usage')
+    def test_update_session_data_ignores_repeated_reports(self, record_usage, incr_daily_usage):
+        self.report(150)
+        record_usage.reset_mock()
+        incr_daily_usage.reset_mock()
+
+        self.assertTrue(self.report(150))
+
+        record_usage.assert_not_called()
+        incr_daily_usage.assert_not_called()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.data_used_mb, 150)
+
+    @mock.patch('networking.mikrotik.record_usage')
+    def test_update_session_data_counter_reset(self, record_usage):
+        get_daily_usage(self.user)  # seed the daily counter
+        self.report(150)
+
+        # Router rebooted: the counter restarts below the stored total
+        self.assertTrue(self.report(20))
+        self.assertTrue(self.report(45))
+
+        self.assertEqual(
+            record_usage.call_args_list,
+            [mock.call(self.subscription.pk, 150), mock.call(self.subscription.pk, 20),
+             mock.call(self.subscription.pk, 25)],
+        )
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.data_used_mb, 45)
+        self.assertEqual(get_daily_usage(self.user), 195)
+
+    def test_update_session_data_missing_session(self):
+        self.session.delete()
+        self.assertFalse(self.report(10))
+
+    def test_terminate_session_releases_connection(self):
+        UserSubscription.increment_connections(self.subscription.pk)
+
+        self.assertTrue(self.manager.terminate_session(self.session.pk, 'user'))
+
+        self.session.refresh_from_db()
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.session.session_status, SessionStatus.TERMINATED)
+        self.assertEqual(self.subscription.current_connections, 0)
+
+    def test_bulk_terminate_releases_connections(self):
+        other_user = self.make_user('0712000102')
+        other_session = ActiveSession.objects.create(user=other_user, subscription=self.subscription)
+        UserSubscription.increment_connections(self.subscription.pk, 2)
+
+        self.assertTrue(self.manager.bulk_terminate([
+            (self.session.pk, 'user'), (other_session.pk, 'other'),
+        ]))
+
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.current_connections, 0)
+        self.assertFalse(
+            ActiveSession.objects.exclude(session_status=SessionStatus.TERMINATED).exists()
+        )
+
+    def test_pause_session_records_one_pause(self):
+        self.assertTrue(self.manager.pause_session(self.session.pk, 'user'))
+        self.assertFalse(self.manager.pause_session(self.session.pk, 'user'))
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.session_status, SessionStatus.PAUSED)
+        self.assertEqual(PausedSession.objects.filter(session=self.session).count(), 1)
+
+    def test_pause_session_rejects_terminated_session(self):
+        self.session.terminate_session()
+        self.manager.connection.reset_mock()
+
+        self.assertFalse(self.manager.pause_session(self.session.pk, 'user'))
+
+        self.manager.connection.path.assert_not_called()
+        self.assertFalse(PausedSession.objects.filter(session=self.session).exists())
+
+    def test_pause_session_lost_race_records_nothing(self):
+        # The session is terminated between the status read and the UPDATE
+        def terminate_first(queue_path, session_id, queue_id, action):
+            ActiveSession.terminate_where(pk=session_id)
+            return True
+
+        with mock.patch.object(self.manager, '_for_each_session_queue', side_effect=terminate_first):
+            self.assertFalse(self.manager.pause_session(self.session.pk, 'user'))
+
+        self.assertFalse(PausedSession.objects.filter(session=self.session).exists())
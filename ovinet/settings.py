@@ -85,6 +85,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RequestCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -101,6 +102,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.platform_settings',
             ],
         },
     },
@@ -125,6 +127,18 @@ DATABASES = {
 
 
 
+# Cache
+# Shared across worker processes: usage counters and cached lookups in the
+# tenants app must agree no matter which process serves the request
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -187,6 +201,11 @@ MIKROTIK_USERNAME = 'admin'
 MIKROTIK_PASSWORD = 'your_password'
 MIKROTIK_PORT = 8728
 
+# Subscription usage buffering (tenants/usage.py): seconds between flushes,
+# which is also the most usage a crashed worker can lose, and rows per UPDATE
+USAGE_FLUSH_INTERVAL = 5
+USAGE_FLUSH_BATCH_SIZE = 1000
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR/'media'
 STATIC_URL = '/static/'
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TenantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tenants'
+
+    def ready(self):
+        # Keep the cached package list and subscription ids in sync
+        import tenants.signals
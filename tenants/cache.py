@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+PACKAGES_CACHE_TIMEOUT = 300
+ACTIVE_SUBSCRIPTION_CACHE_TIMEOUT = 30
+DAILY_USAGE_CACHE_TIMEOUT = 48 * 3600
+
+
+def packages_cache_key():
+    return f"tenant:{connection.schema_name}:packages:active"
+
+
+def active_subscription_cache_key(user_id):
+    return f"tenant:{connection.schema_name}:user:{user_id}:active_subscription"
+
+
+def clear_active_subscription(user_id):
+    cache.delete(active_subscription_cache_key(user_id))
+
+
+def daily_usage_cache_key(user_id, day=None):
+    day = day or timezone.localdate()
+    return f"tenant:{connection.schema_name}:usage:{user_id}:{day.isoformat()}"
+
+
+def incr_daily_usage(user_id, delta_mb, day=None):
+    # Only bump a counter that is already seeded; a missing key is rebuilt
+    # from SQL on the next read rather than started from a partial value
+    try:
+        cache.incr(daily_usage_cache_key(user_id, day), delta_mb)
+    except ValueError:
+        pass
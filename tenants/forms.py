@@ -1,16 +1,9 @@
 from django import forms
+from core.constants import PauseReason
 
 class SessionPauseForm(forms.Form):
-    PAUSE_REASON_CHOICES = [
-        ('user_request', 'User Request'),
-        ('admin_action', 'Admin Action'),
-        ('system_auto', 'System Auto-pause'),
-        ('payment_issue', 'Payment Issue'),
-        ('other', 'Other'),
-    ]
-
     pause_reason = forms.ChoiceField(
-        choices=PAUSE_REASON_CHOICES,
+        choices=PauseReason.choices,
         required=True,
         label="Pause Reason"
     )
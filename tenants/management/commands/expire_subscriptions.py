@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tenants.models import UserSubscription
+
+
+class Command(BaseCommand):
+    help = "Mark subscriptions past their expiry date as expired (run per tenant, e.g. via all_tenants_command)"
+
+    def handle(self, *args, **options):
+        expired = UserSubscription.all_objects.expire_lapsed()
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} subscriptions."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-15 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activesession',
+            name='session_status',
+            field=models.CharField(choices=[('active', 'Active'), ('paused', 'Paused'), ('expired', 'Expired'), ('cancelled', 'Cancelled'), ('terminated', 'Terminated')], default='active', help_text='Current status of the session', max_length=20),
+        ),
+    ]
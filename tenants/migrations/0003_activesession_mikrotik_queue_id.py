@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-15 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_alter_activesession_session_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activesession',
+            name='mikrotik_queue_id',
+            field=models.CharField(blank=True, help_text="RouterOS .id of the session's simple queue", max_length=32, null=True),
+        ),
+    ]
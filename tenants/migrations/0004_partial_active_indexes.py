@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-15 12:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tenants', '0003_activesession_mikrotik_queue_id'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='usersubscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['user', 'expiry_date'], name='usersub_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='activesession',
+            index=models.Index(condition=models.Q(('session_status', 'active')), fields=['user', 'start_time'], name='sess_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='pausedsession',
+            index=models.Index(condition=models.Q(('resumed_at__isnull', True)), fields=['session'], name='pause_open_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-15 12:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tenants', '0004_partial_active_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='activesession',
+            index=models.Index(fields=['user', '-start_time'], name='sess_user_start_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='activesession',
+            index=models.Index(fields=['subscription', 'session_status'], name='sess_sub_status_idx'),
+        ),
+    ]
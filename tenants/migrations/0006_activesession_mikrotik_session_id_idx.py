@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-15 13:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tenants', '0005_activesession_composite_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='activesession',
+            index=models.Index(fields=['mikrotik_session_id'], name='sess_mikrotik_id_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-15 13:50
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def resolve_duplicate_active(apps, schema_editor):
+    # Lapsed rows still marked active become expired; of what remains, each
+    # user keeps the subscription that runs longest and the rest are cancelled
+    UserSubscription = apps.get_model('tenants', 'UserSubscription')
+    UserSubscription.objects.filter(status='active', expiry_date__lt=Now()).update(status='expired')
+
+    active = UserSubscription.objects.filter(status='active', is_deleted=False)
+    duplicated = (
+        active.values('user_id').annotate(n=models.Count('id')).filter(n__gt=1).values_list('user_id', flat=True)
+    )
+    for user_id in duplicated:
+        keep = active.filter(user_id=user_id).order_by('-expiry_date', '-purchase_date').values_list('pk', flat=True)[0]
+        active.filter(user_id=user_id).exclude(pk=keep).update(status='cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0006_activesession_mikrotik_session_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_duplicate_active, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usersubscription',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False), ('status', 'active')), fields=('user',), name='one_active_sub_per_user'),
+        ),
+    ]
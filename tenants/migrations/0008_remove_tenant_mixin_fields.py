@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-15 16:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0007_usersubscription_one_active_sub_per_user'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='activesession',
+            name='schema_name',
+        ),
+        migrations.RemoveField(
+            model_name='datapackage',
+            name='schema_name',
+        ),
+        migrations.RemoveField(
+            model_name='mpesatransaction',
+            name='schema_name',
+        ),
+        migrations.RemoveField(
+            model_name='pausedsession',
+            name='schema_name',
+        ),
+        migrations.RemoveField(
+            model_name='usersubscription',
+            name='schema_name',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-15 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0008_remove_tenant_mixin_fields'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='activesession',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='activesession',
+            constraint=models.UniqueConstraint(condition=models.Q(('session_status', 'active')), fields=('user', 'subscription'), name='one_active_session_per_sub'),
+        ),
+    ]
@@ -1,11 +1,14 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, Now, NullIf
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.urls import reverse
-from django_tenants.models import TenantMixin
 from core.models import BaseModel
-from core.constants import DurationStatus, SessionStatus
+from core.constants import DurationStatus, PauseReason, SessionStatus
 from core.managers import SoftDeleteManager, AllObjectsManager
+from .cache import clear_active_subscription
 
 # -----------------------------
 # Subscription Status (Tenant-specific)
@@ -19,7 +22,7 @@ class SubscriptionStatus(models.TextChoices):
 # -----------------------------
 # Data Package Model
 # -----------------------------
-class DataPackage(BaseModel, TenantMixin):
+class DataPackage(BaseModel):
     """Data packages offered by the vendor (tenant-specific)"""
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
@@ -86,7 +89,39 @@ class DataPackage(BaseModel, TenantMixin):
 # -----------------------------
 # User Subscription Model
 # -----------------------------
-class UserSubscription(BaseModel, TenantMixin):
+class UserSubscriptionQuerySet(models.QuerySet):
+    def active(self):
+        """Subscriptions that are active and not yet expired"""
+        return self.filter(status='active', expiry_date__gte=Now())
+
+    def lapsed(self):
+        """Subscriptions still marked active whose expiry has passed"""
+        return self.filter(status='active', expiry_date__lt=Now())
+
+    def expire_lapsed(self):
+        """Move lapsed subscriptions to expired; returns the number changed"""
+        return self.lapsed().update(status=SubscriptionStatus.EXPIRED)
+
+    def with_active_now(self):
+        """Annotate active_now so lists need not call is_active per row"""
+        return self.annotate(active_now=models.Case(
+            models.When(status='active', expiry_date__gte=Now(), then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+    def with_usage_pct(self):
+        """Annotate usage_pct, the SQL counterpart of data_usage_percentage"""
+        return self.annotate(usage_pct=Coalesce(
+            Least(
+                models.Value(100.0),
+                Cast('data_used_mb', models.FloatField()) * 100.0
+                / NullIf(models.F('package__data_limit_mb'), 0),
+            ),
+            models.Value(0.0),
+        ))
+
+class UserSubscription(BaseModel):
     """User subscriptions to data packages (tenant-specific)"""
     user = models.ForeignKey(
         'accounts.User',
@@ -128,8 +163,8 @@ class UserSubscription(BaseModel, TenantMixin):
     )
 
     # Managers
-    objects = SoftDeleteManager()
-    all_objects = AllObjectsManager()
+    objects = SoftDeleteManager.from_queryset(UserSubscriptionQuerySet)()
+    all_objects = AllObjectsManager.from_queryset(UserSubscriptionQuerySet)()
 
     class Meta:
         verbose_name = 'User Subscription'
@@ -139,18 +174,44 @@ class UserSubscription(BaseModel, TenantMixin):
             models.Index(fields=['status']),
             models.Index(fields=['expiry_date']),
             models.Index(fields=['user', 'status']),
+            models.Index(
+                fields=['user', 'expiry_date'],
+                name='usersub_active_idx',
+                condition=models.Q(status='active'),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(status='active', is_deleted=False),
+                name='one_active_sub_per_user',
+            ),
         ]
 
     def __str__(self):
         return f"{self.user.phone_number} - {self.package.name}"
 
-    def save(self, *args, **kwargs):
-        """Auto-set expiry date if not provided"""
-        if not self.expiry_date and self.package:
-            self.expiry_date = timezone.now() + timezone.timedelta(
-                days=self.package.duration_days
-            )
-        super().save(*args, **kwargs)
+    @classmethod
+    def create_for(cls, user, package, commit=True, **kwargs):
+        """Build a subscription with expiry computed from the given package.
+
+        The database allows one active subscription per user, so saving raises
+        IntegrityError if the user already has one; callers catch it instead of
+        checking first. A lapsed subscription still marked active is expired
+        in the same transaction so it doesn't block the purchase.
+        """
+        subscription = cls(
+            user=user,
+            package=package,
+            expiry_date=timezone.now() + timezone.timedelta(days=package.duration_days),
+            **kwargs
+        )
+        if commit:
+            # Savepoint so a duplicate doesn't poison the caller's transaction
+            with transaction.atomic():
+                cls.all_objects.filter(user=user).expire_lapsed()
+                subscription.save()
+        return subscription
 
     @property
     def is_active(self):
@@ -161,6 +222,20 @@ class UserSubscription(BaseModel, TenantMixin):
     def is_paused(self):
         return self.status == 'paused'
 
+    @classmethod
+    def increment_connections(cls, pk, amount=1):
+        """Atomically add to current_connections without reading the row"""
+        return cls.all_objects.filter(pk=pk).update(
+            current_connections=models.F('current_connections') + amount
+        )
+
+    @classmethod
+    def decrement_connections(cls, pk, amount=1):
+        """Atomically subtract from current_connections, clamped at zero"""
+        return cls.all_objects.filter(pk=pk, current_connections__gt=0).update(
+            current_connections=Greatest(models.F('current_connections') - amount, 0)
+        )
+
     @property
     def has_reached_connection_limit(self):
         """Check if connection limit has been reached"""
@@ -169,10 +244,11 @@ class UserSubscription(BaseModel, TenantMixin):
     @property
     def time_remaining(self):
         """Human-readable time remaining"""
-        if not self.is_active:
+        now = timezone.now()
+        if self.status != 'active' or self.expiry_date < now:
             return "Not active"
         
-        remaining = self.expiry_date - timezone.now()
+        remaining = self.expiry_date - now
         if remaining.total_seconds() <= 0:
             return "Expired"
         
@@ -195,22 +271,28 @@ class UserSubscription(BaseModel, TenantMixin):
             return 0
         return min(100, (self.data_used_mb / self.package.data_limit_mb) * 100)
 
+    def _transition(self, from_status, to_status):
+        # Conditional UPDATE so concurrent callers cannot both win
+        updated = type(self).all_objects.filter(
+            pk=self.pk, status=from_status
+        ).update(status=to_status)
+        if updated:
+            self.status = to_status
+            clear_active_subscription(self.user_id)
+        return bool(updated)
+
     def pause(self):
         """Pause the subscription"""
-        if self.status == 'active':
-            self.status = 'paused'
-            self.save(update_fields=['status'])
+        return self._transition('active', 'paused')
 
     def unpause(self):
         """Unpause the subscription"""
-        if self.status == 'paused':
-            self.status = 'active'
-            self.save(update_fields=['status'])
+        return self._transition('paused', 'active')
 
 # -----------------------------
 # Active Session Model
 # -----------------------------
-class ActiveSession(BaseModel, TenantMixin):
+class ActiveSession(BaseModel):
     """Active user sessions (tenant-specific)"""
     user = models.ForeignKey(
         'accounts.User',
@@ -262,6 +344,12 @@ class ActiveSession(BaseModel, TenantMixin):
         blank=True,
         help_text="MikroTik session ID for tracking"
     )
+    mikrotik_queue_id = models.CharField(
+        max_length=32,
+        null=True,
+        blank=True,
+        help_text="RouterOS .id of the session's simple queue"
+    )
     max_duration_minutes = models.PositiveIntegerField(
         default=1440,  # 24 hours
         help_text="Maximum allowed session duration in minutes"
@@ -279,8 +367,23 @@ class ActiveSession(BaseModel, TenantMixin):
             models.Index(fields=['session_status']),
             models.Index(fields=['start_time']),
             models.Index(fields=['user', 'session_status']),
+            models.Index(
+                fields=['user', 'start_time'],
+                name='sess_active_idx',
+                condition=models.Q(session_status='active'),
+            ),
+            models.Index(fields=['user', '-start_time'], name='sess_user_start_idx'),
+            models.Index(fields=['subscription', 'session_status'], name='sess_sub_status_idx'),
+            models.Index(fields=['mikrotik_session_id'], name='sess_mikrotik_id_idx'),
+        ]
+        constraints = [
+            # Prevents duplicate active sessions; ended sessions may pile up freely
+            models.UniqueConstraint(
+                fields=['user', 'subscription'],
+                condition=models.Q(session_status='active'),
+                name='one_active_session_per_sub',
+            ),
         ]
-        unique_together = ['user', 'subscription', 'session_status']  # Prevents duplicate active sessions
 
     def __str__(self):
         return f"Session {self.id} for {self.user.phone_number}"
@@ -306,34 +409,61 @@ class ActiveSession(BaseModel, TenantMixin):
 
     def pause_session(self):
         """Pause the session"""
-        if self.session_status == SessionStatus.ACTIVE:
+        updated = type(self).all_objects.filter(
+            pk=self.pk, session_status=SessionStatus.ACTIVE
+        ).update(session_status=SessionStatus.PAUSED)
+        if updated:
             self.session_status = SessionStatus.PAUSED
-            self.save(update_fields=['session_status'])
+        return bool(updated)
 
     def resume_session(self):
         """Resume the session"""
-        if self.session_status == SessionStatus.PAUSED:
+        updated = type(self).all_objects.filter(
+            pk=self.pk, session_status=SessionStatus.PAUSED
+        ).update(session_status=SessionStatus.ACTIVE)
+        if updated:
             self.session_status = SessionStatus.ACTIVE
-            self.save(update_fields=['session_status'])
+        return bool(updated)
+
+    @classmethod
+    def terminate_where(cls, end_time=None, **filters):
+        """Terminate the matching sessions and release their subscription
+        connections in one transaction; returns how many were terminated.
+
+        Shared by every termination path so current_connections can't drift.
+        """
+        end_time = end_time or timezone.now()
+        with transaction.atomic():
+            rows = list(
+                cls.all_objects.select_for_update().filter(**filters).exclude(
+                    session_status=SessionStatus.TERMINATED
+                ).values_list('pk', 'subscription_id')
+            )
+            if not rows:
+                return 0
+            cls.all_objects.filter(pk__in=[pk for pk, _ in rows]).update(
+                session_status=SessionStatus.TERMINATED, end_time=end_time
+            )
+            per_subscription = Counter(sub_id for _, sub_id in rows if sub_id)
+            for subscription_id, count in per_subscription.items():
+                UserSubscription.decrement_connections(subscription_id, count)
+        return len(rows)
 
     def terminate_session(self):
         """Terminate the session"""
-        self.session_status = SessionStatus.TERMINATED
-        self.end_time = timezone.now()
-        self.save(update_fields=['session_status', 'end_time'])
+        end_time = timezone.now()
+        updated = type(self).terminate_where(end_time=end_time, pk=self.pk)
+        if updated:
+            self.session_status = SessionStatus.TERMINATED
+            self.end_time = end_time
+        return bool(updated)
 
 # -----------------------------
 # Paused Session Model
 # -----------------------------
-class PausedSession(BaseModel, TenantMixin):
+class PausedSession(BaseModel):
     """Track session pause history (tenant-specific)"""
-    PAUSE_REASON_CHOICES = (
-        ('user_request', 'User Request'),
-        ('admin_action', 'Admin Action'),
-        ('system_auto', 'System Auto-pause'),
-        ('payment_issue', 'Payment Issue'),
-        ('other', 'Other'),
-    )
+    PAUSE_REASON_CHOICES = PauseReason.choices
     
     session = models.ForeignKey(
         ActiveSession,
@@ -352,8 +482,8 @@ class PausedSession(BaseModel, TenantMixin):
     )
     pause_reason = models.CharField(
         max_length=20,
-        choices=PAUSE_REASON_CHOICES,
-        default='other',
+        choices=PauseReason.choices,
+        default=PauseReason.OTHER,
         help_text="Reason for pausing the session"
     )
     pause_description = models.TextField(
@@ -378,6 +508,13 @@ class PausedSession(BaseModel, TenantMixin):
         ordering = ['-paused_at']
         verbose_name = "Paused Session"
         verbose_name_plural = "Paused Sessions"
+        indexes = [
+            models.Index(
+                fields=['session'],
+                name='pause_open_idx',
+                condition=models.Q(resumed_at__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Paused Session {self.session.id}"
@@ -396,13 +533,20 @@ class PausedSession(BaseModel, TenantMixin):
 
     def resume(self):
         """Resume the paused session"""
-        if self.resumed_at is None:
-            self.resumed_at = timezone.now()
-            self.save()
+        resumed_at = timezone.now()
+        with transaction.atomic():
+            if not type(self).all_objects.filter(
+                pk=self.pk, resumed_at__isnull=True
+            ).update(resumed_at=resumed_at):
+                return False
             # Also resume the main session
-            self.session.resume_session()
+            ActiveSession.all_objects.filter(
+                pk=self.session_id, session_status=SessionStatus.PAUSED
+            ).update(session_status=SessionStatus.ACTIVE)
+        self.resumed_at = resumed_at
+        return True
             
-class MpesaTransaction(BaseModel, TenantMixin):
+class MpesaTransaction(BaseModel):
     merchant_request_id = models.CharField(max_length=100, unique=True)
     checkout_request_id = models.CharField(max_length=100, unique=True)
     response_code = models.CharField(max_length=10)
@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from core.request_cache import cache_for_request
+from core.utils import today_range
+from .cache import (
+    ACTIVE_SUBSCRIPTION_CACHE_TIMEOUT, DAILY_USAGE_CACHE_TIMEOUT,
+    active_subscription_cache_key, daily_usage_cache_key,
+)
+from .models import ActiveSession, UserSubscription
+
+
+@cache_for_request
+def get_active_subscription(user):
+    """Return the user's active subscription (with package) or None.
+
+    Memoized for the request and cached for a short TTL; save(), pause() and
+    unpause() clear the entry, and a cached row that has since expired is
+    treated as a miss.
+    """
+    key = active_subscription_cache_key(user.pk)
+    subscription = cache.get(key)
+    if subscription is None or (subscription and not subscription.is_active):
+        subscription = UserSubscription.objects.active().filter(
+            user=user
+        ).select_related('package').only(
+            'id', 'user', 'package', 'status', 'purchase_date', 'expiry_date',
+            'data_used_mb', 'simultaneous_connections', 'current_connections',
+            'package__name', 'package__price', 'package__data_limit_mb',
+            'package__duration_status', 'package__duration_days',
+            'package__bandwidth_limit_mbps',
+        ).first() or False
+        cache.set(key, subscription, ACTIVE_SUBSCRIPTION_CACHE_TIMEOUT)
+    return subscription or None
+
+
+@cache_for_request
+def get_daily_usage(user):
+    """Return MB used today by sessions of the user.
+
+    Read from a counter the MikroTik polling path increments; on a miss the
+    total is summed in SQL and the counter seeded with it.
+    """
+    key = daily_usage_cache_key(user.pk)
+    total = cache.get(key)
+    if total is None:
+        today_start, today_end = today_range()
+        total = ActiveSession.objects.filter(
+            user=user,
+            start_time__gte=today_start,
+            start_time__lt=today_end
+        ).aggregate(total=Coalesce(Sum('data_used_mb'), 0))['total']
+        cache.add(key, total, DAILY_USAGE_CACHE_TIMEOUT)
+    return total
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import (
+    ACTIVE_SUBSCRIPTION_CACHE_TIMEOUT, active_subscription_cache_key,
+    clear_active_subscription, packages_cache_key,
+)
+from .models import DataPackage, UserSubscription
+
+
+@receiver([post_save, post_delete], sender=DataPackage)
+def clear_package_list(sender, **kwargs):
+    cache.delete(packages_cache_key())
+
+
+@receiver(post_save, sender=UserSubscription)
+def store_user_active_subscription(sender, instance, **kwargs):
+    # Write through, so the first read after a purchase is already a hit
+    if instance.is_active and not instance.is_deleted:
+        instance.package  # loaded now so cached readers never fetch it
+        cache.set(
+            active_subscription_cache_key(instance.user_id),
+            instance,
+            ACTIVE_SUBSCRIPTION_CACHE_TIMEOUT,
+        )
+    else:
+        clear_active_subscription(instance.user_id)
+
+
+@receiver(post_delete, sender=UserSubscription)
+def clear_user_active_subscription(sender, instance, **kwargs):
+    clear_active_subscription(instance.user_id)
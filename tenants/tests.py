@@ -1,3 +1,289 @@
-from django.test import TestCase
+from contextlib import nullcontext
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_tenants.test.cases import TenantTestCase
+from django_tenants.test.client import TenantClient
+
+from accounts.models import User
+from core.constants import PauseReason, SessionStatus
+from . import usage
+from .models import ActiveSession, DataPackage, PausedSession, SubscriptionStatus, UserSubscription
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class VendorTenantTestCase(TenantTestCase):
+    """TenantTestCase with the Vendor fields the tenant model requires"""
+
+    @classmethod
+    def get_test_schema_name(cls):
+        # Vendor soft-deletes, so each class's tenant row outlives its schema
+        return f"test_{cls.__name__.lower()}"
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.business_name = f"Test Vendor {cls.__name__}"
+        tenant.business_email = f"{tenant.schema_name}@example.com"
+        tenant.business_phone = '0700000000'
+        tenant.address = 'Nairobi'
+        tenant.contact_person = 'Test Contact'
+        tenant.contact_email = 'contact@example.com'
+        tenant.contact_phone = '0700000000'
+
+    @classmethod
+    def setUpClass(cls):
+        # TenantTestCase.setUpClass skips SimpleTestCase's, so a class-level
+        # override_settings would never be applied; saving the tenant already
+        # touches the cache
+        caches = override_settings(CACHES=LOCMEM_CACHES)
+        caches.enable()
+        cls.addClassCleanup(caches.disable)
+        super().setUpClass()
+
+    def make_user(self, phone_number):
+        return User.objects.create_user(phone_number, password='test-pass-123')
+
+    def make_package(self, price='50.00', **kwargs):
+        return DataPackage.objects.create(
+            name='Daily 1GB', data_limit_mb=1024, duration_days=1, price=price, **kwargs
+        )
+
+
+class ConnectionCountTests(VendorTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('0712000001')
+        self.other_user = self.make_user('0712000002')
+        self.subscription = UserSubscription.create_for(
+            self.user, self.make_package(), simultaneous_connections=2
+        )
+
+    def open_session(self, user):
+        session = ActiveSession.objects.create(user=user, subscription=self.subscription)
+        UserSubscription.increment_connections(self.subscription.pk)
+        return session
+
+    def current_connections(self):
+        self.subscription.refresh_from_db()
+        return self.subscription.current_connections
+
+    def test_terminate_session_releases_connection_once(self):
+        session = self.open_session(self.user)
+        self.assertEqual(self.current_connections(), 1)
+
+        self.assertTrue(session.terminate_session())
+        self.assertEqual(session.session_status, SessionStatus.TERMINATED)
+        self.assertIsNotNone(session.end_time)
+        self.assertEqual(self.current_connections(), 0)
+
+        # Terminating again must not release the connection a second time
+        self.assertFalse(session.terminate_session())
+        self.assertEqual(self.current_connections(), 0)
+
+    def test_terminate_where_releases_one_connection_per_session(self):
+        self.open_session(self.user)
+        self.open_session(self.other_user)
+        self.assertEqual(self.current_connections(), 2)
+
+        self.assertEqual(ActiveSession.terminate_where(subscription=self.subscription), 2)
+        self.assertEqual(self.current_connections(), 0)
+        self.assertFalse(
+            ActiveSession.objects.exclude(session_status=SessionStatus.TERMINATED).exists()
+        )
+
+    def test_terminate_sessions_of_same_subscription(self):
+        first = self.open_session(self.user)
+        self.assertTrue(first.terminate_session())
+
+        # A reconnect under the same subscription can be terminated too
+        second = self.open_session(self.user)
+        self.assertTrue(second.terminate_session())
+
+        # And a bulk cut-off can end a paused and an active session together
+        paused = self.open_session(self.user)
+        paused.pause_session()
+        self.open_session(self.user)
+        self.assertEqual(ActiveSession.terminate_where(user=self.user, subscription=self.subscription), 2)
+
+        self.assertEqual(
+            ActiveSession.objects.filter(session_status=SessionStatus.TERMINATED).count(), 4
+        )
+        self.assertEqual(self.current_connections(), 0)
+
+    def test_decrement_connections_clamps_at_zero(self):
+        UserSubscription.increment_connections(self.subscription.pk)
+        UserSubscription.decrement_connections(self.subscription.pk, 3)
+        self.assertEqual(self.current_connections(), 0)
+
+        self.assertEqual(UserSubscription.decrement_connections(self.subscription.pk), 0)
+        self.assertEqual(self.current_connections(), 0)
+
+    def test_terminate_view_releases_connection(self):
+        session = self.open_session(self.user)
+        client = TenantClient(self.tenant)
+        client.force_login(self.user)
+
+        response = client.post(reverse('tenants:terminate_session', args=[session.pk]))
+
+        self.assertRedirects(response, reverse('tenants:session_list'), fetch_redirect_response=False)
+        session.refresh_from_db()
+        self.assertEqual(session.session_status, SessionStatus.TERMINATED)
+        self.assertEqual(self.current_connections(), 0)
+
+    def test_terminate_view_ignores_other_users_session(self):
+        session = self.open_session(self.user)
+        client = TenantClient(self.tenant)
+        client.force_login(self.other_user)
+
+        client.post(reverse('tenants:terminate_session', args=[session.pk]))
+
+        session.refresh_from_db()
+        self.assertEqual(session.session_status, SessionStatus.ACTIVE)
+        self.assertEqual(self.current_connections(), 1)
+
+
+class OneActiveSubscriptionTests(VendorTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('0712000003')
+        self.package = self.make_package()
+
+    def active_count(self):
+        return UserSubscription.objects.filter(user=self.user, status=SubscriptionStatus.ACTIVE).count()
+
+    def test_second_active_subscription_is_rejected(self):
+        UserSubscription.create_for(self.user, self.package)
+        with self.assertRaises(IntegrityError):
+            UserSubscription.create_for(self.user, self.package)
+        # The savepoint leaves the surrounding transaction usable
+        self.assertEqual(self.active_count(), 1)
+
+    def test_lapsed_subscription_is_expired_on_purchase(self):
+        old = UserSubscription.create_for(self.user, self.package)
+        UserSubscription.objects.filter(pk=old.pk).update(
+            expiry_date=timezone.now() - timezone.timedelta(hours=1)
+        )
+
+        new = UserSubscription.create_for(self.user, self.package)
+
+        old.refresh_from_db()
+        self.assertEqual(old.status, SubscriptionStatus.EXPIRED)
+        self.assertEqual(new.status, SubscriptionStatus.ACTIVE)
+        self.assertEqual(self.active_count(), 1)
+
+    def test_purchase_free_package_creates_subscription(self):
+        package = self.make_package(price='0.00')
+        client = TenantClient(self.tenant)
+        client.force_login(self.user)
+
+        response = client.get(reverse('tenants:purchase_package', args=[package.pk]))
+
+        subscription = UserSubscription.objects.get(user=self.user)
+        self.assertRedirects(
+            response, reverse('tenants:subscription_success', args=[subscription.pk]),
+            fetch_redirect_response=False,
+        )
+
+    def test_concurrent_purchase_hits_constraint(self):
+        # A purchase that raced past the active-subscription check
+        package = self.make_package(price='0.00')
+        UserSubscription.create_for(self.user, package)
+        client = TenantClient(self.tenant)
+        client.force_login(self.user)
+
+        with mock.patch('tenants.views.get_active_subscription', return_value=None):
+            response = client.get(reverse('tenants:purchase_package', args=[package.pk]))
+
+        self.assertRedirects(response, reverse('tenants:subscription_list'), fetch_redirect_response=False)
+        self.assertEqual(self.active_count(), 1)
+
+    def test_expire_subscriptions_command(self):
+        subscription = UserSubscription.create_for(self.user, self.package)
+        UserSubscription.objects.filter(pk=subscription.pk).update(
+            expiry_date=timezone.now() - timezone.timedelta(minutes=1)
+        )
+
+        call_command('expire_subscriptions', verbosity=0)
+
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, SubscriptionStatus.EXPIRED)
+
+
+class PauseSessionViewTests(VendorTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('0712000004')
+        subscription = UserSubscription.create_for(self.user, self.make_package())
+        self.session = ActiveSession.objects.create(user=self.user, subscription=subscription)
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.url = reverse('tenants:pause_session', args=[self.session.pk])
+
+    def test_missing_reason_defaults_to_user_request(self):
+        response = self.client.post(self.url, {'pause_description': 'Lunch'})
+
+        self.assertRedirects(response, reverse('tenants:session_list'), fetch_redirect_response=False)
+        pause = PausedSession.objects.get(session=self.session)
+        self.assertEqual(pause.pause_reason, PauseReason.USER_REQUEST)
+        self.assertEqual(pause.pause_description, 'Lunch')
+
+    def test_invalid_reason_redisplays_form(self):
+        with mock.patch('tenants.views.render', return_value=HttpResponse()) as render:
+            self.client.post(self.url, {'pause_reason': 'bogus'})
+
+        form = render.call_args.args[2]['form']
+        self.assertIn('pause_reason', form.errors)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.session_status, SessionStatus.ACTIVE)
+        self.assertFalse(PausedSession.objects.filter(session=self.session).exists())
+
+
+@mock.patch('tenants.usage.schema_context', lambda schema_name: nullcontext())
+@mock.patch('tenants.usage.threading.Timer')
+class UsageFlushTests(SimpleTestCase):
+    def setUp(self):
+        usage._PENDING.clear()
+        usage._timer = None
+
+    def tearDown(self):
+        usage._PENDING.clear()
+        usage._timer = None
+
+    def test_failed_flush_requeues_deltas_and_schedules_retry(self, timer):
+        usage._PENDING['tenant_a']['sub-1'] += 5
+        usage._PENDING['tenant_a']['sub-2'] += 7
+
+        with mock.patch('tenants.usage._apply', side_effect=Exception('db down')):
+            self.assertEqual(usage.flush(), 0)
+
+        self.assertEqual(dict(usage._PENDING['tenant_a']), {'sub-1': 5, 'sub-2': 7})
+        timer.assert_called_once_with(usage.FLUSH_INTERVAL, usage._flush_from_timer)
+        timer.return_value.start.assert_called_once_with()
+
+    def test_failed_batch_requeues_only_unwritten_rows(self, timer):
+        usage._PENDING['tenant_a']['sub-1'] += 5
+        usage._PENDING['tenant_a']['sub-2'] += 7
+
+        with mock.patch('tenants.usage.FLUSH_BATCH_SIZE', 1), \
+                mock.patch('tenants.usage._apply', side_effect=[None, Exception('db down')]) as apply:
+            self.assertEqual(usage.flush(), 1)
+
+        apply.assert_any_call([('sub-1', 5)])
+        self.assertEqual(dict(usage._PENDING['tenant_a']), {'sub-2': 7})
+        timer.return_value.start.assert_called_once_with()
+
+    def test_successful_flush_leaves_nothing_pending(self, timer):
+        usage._PENDING['tenant_a']['sub-1'] += 5
+
+        with mock.patch('tenants.usage._apply') as apply:
+            self.assertEqual(usage.flush(), 1)
+
+        apply.assert_called_once_with([('sub-1', 5)])
+        self.assertFalse(usage._PENDING)
+        timer.assert_not_called()
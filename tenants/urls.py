@@ -23,6 +23,7 @@ urlpatterns = [
     # Dashboard and analytics routes
     path('dashboard/', views.tenant_dashboard, name='dashboard'),
     path('usage-history/', views.usage_history, name='usage_history'),
+    path('usage-history/export/', views.usage_history_export, name='usage_history_export'),
     path('session-stats/', views.session_stats, name='session_stats'),
     
     # Purchase result routes
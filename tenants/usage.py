@@ -0,0 +1,104 @@
+"""
+Buffered writes of UserSubscription.data_used_mb.
+
+Subscription data counters are written by every polling update; deltas are
+summed here per (schema, subscription) and applied in one UPDATE per tenant.
+
+The buffer lives in each worker process, so the column is eventually
+consistent: it trails the router by up to USAGE_FLUSH_INTERVAL seconds, and
+quota and connection-limit checks that read it see that lag. Pending deltas
+are flushed at a clean exit, but a crash (SIGKILL, OOM) loses up to one
+interval of usage.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django_tenants.utils import schema_context
+
+from .models import UserSubscription
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'USAGE_FLUSH_INTERVAL', 5)  # seconds
+FLUSH_BATCH_SIZE = getattr(settings, 'USAGE_FLUSH_BATCH_SIZE', 1000)
+
+_PENDING = defaultdict(lambda: defaultdict(int))
+_LOCK = threading.Lock()
+_timer = None
+
+
+def record_usage(subscription_id, delta_mb):
+    """Queue delta_mb to be added to the subscription's data_used_mb"""
+    if not subscription_id or not delta_mb:
+        return
+    with _LOCK:
+        _PENDING[connection.schema_name][subscription_id] += delta_mb
+        _schedule()
+
+
+def _schedule():
+    # Caller holds _LOCK
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(FLUSH_INTERVAL, _flush_from_timer)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_from_timer():
+    try:
+        flush()
+    finally:
+        close_old_connections()
+
+
+def _apply(rows):
+    table = connection.ops.quote_name(UserSubscription._meta.db_table)
+    values = ', '.join(['(%s::uuid, %s::bigint)'] * len(rows))
+    params = [str(value) for row in rows for value in row]
+    with connection.cursor() as cursor:
+        # Additive in SQL, so increments racing with this flush are kept
+        cursor.execute(
+            f"UPDATE {table} AS s SET data_used_mb = s.data_used_mb + t.v "
+            f"FROM (VALUES {values}) AS t(id, v) WHERE s.id = t.id",
+            params,
+        )
+
+
+def flush():
+    """Apply all pending usage deltas; returns the number of rows written"""
+    global _timer
+    with _LOCK:
+        pending = dict(_PENDING)
+        _PENDING.clear()
+        if _timer is not None:
+            _timer.cancel()
+        _timer = None
+
+    written = 0
+    for schema_name, deltas in pending.items():
+        rows = list(deltas.items())
+        start = 0
+        try:
+            with schema_context(schema_name):
+                while start < len(rows):
+                    _apply(rows[start:start + FLUSH_BATCH_SIZE])
+                    start += FLUSH_BATCH_SIZE
+        except Exception:
+            logger.exception("Failed to flush %s usage counters for schema %s", len(rows) - start, schema_name)
+            # Put back only the batches that were not applied, and make sure a
+            # retry is scheduled even if no new usage arrives
+            with _LOCK:
+                for subscription_id, delta in rows[start:]:
+                    _PENDING[schema_name][subscription_id] += delta
+                _schedule()
+        written += min(start, len(rows))
+    return written
+
+
+# The timer is a daemon thread and won't run at shutdown; flush on exit instead
+atexit.register(_flush_from_timer)
@@ -1,22 +1,36 @@
+import csv
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from django.utils import timezone
-from django.db.models import Sum
 
+from core.constants import PauseReason
+from core.utils import today_range
+
+from .cache import PACKAGES_CACHE_TIMEOUT, clear_active_subscription, packages_cache_key
+from .forms import SessionPauseForm
 from .models import DataPackage, UserSubscription, ActiveSession, PausedSession
+from .selectors import get_active_subscription, get_daily_usage
+
+USAGE_HISTORY_PAGE_SIZE = 50
 
 def package_list(request):
     """List all available data packages - public access"""
-    packages = DataPackage.objects.filter(is_active=True).order_by('price')
+    key = packages_cache_key()
+    packages = cache.get(key)
+    if packages is None:
+        packages = list(DataPackage.objects.filter(is_active=True).order_by('price'))
+        cache.set(key, packages, PACKAGES_CACHE_TIMEOUT)
     
     active_subscription = None
     if request.user.is_authenticated:
-        active_subscription = UserSubscription.objects.filter(
-            user=request.user,
-            status='active',
-            expiry_date__gte=timezone.now()
-        ).first()
+        active_subscription = get_active_subscription(request.user)
     
     return render(request, 'tenants/package_list.html', {
         'packages': packages,
@@ -29,23 +43,36 @@ def purchase_package(request, package_id):
     package = get_object_or_404(DataPackage, pk=package_id, is_active=True)
     
     # Check if user already has active subscription
-    active_sub = UserSubscription.objects.filter(
-        user=request.user,
-        status='active',
-        expiry_date__gte=timezone.now()
-    ).first()
+    active_sub = get_active_subscription(request.user)
     
     if active_sub:
         messages.warning(request, 'You already have an active subscription!')
         return redirect('tenants:subscription_detail', pk=active_sub.pk)
     
+    # Free packages need no payment; the insert itself enforces one active
+    # subscription per user, which also covers a concurrent purchase
+    if not package.price:
+        try:
+            subscription = UserSubscription.create_for(request.user, package)
+        except IntegrityError:
+            clear_active_subscription(request.user.pk)
+            messages.warning(request, 'You already have an active subscription!')
+            return redirect('tenants:subscription_list')
+        return redirect('tenants:subscription_success', pk=subscription.pk)
+    
     # Redirect to billing app for payment processing
     return redirect('billing:initiate_payment', package_id=package.id)
 
 @login_required
 def subscription_list(request):
     """List all subscriptions for the current user"""
-    subscriptions = UserSubscription.objects.filter(user=request.user).order_by('-purchase_date')
+    subscriptions = UserSubscription.objects.filter(
+        user=request.user
+    ).select_related('package').with_active_now().with_usage_pct().only(
+        'id', 'package', 'status', 'purchase_date', 'expiry_date', 'data_used_mb',
+        'package__name', 'package__price', 'package__data_limit_mb',
+        'package__duration_status',
+    ).order_by('-purchase_date')
     return render(request, 'tenants/subscription_list.html', {
         'subscriptions': subscriptions
     })
@@ -54,17 +81,21 @@ def subscription_list(request):
 @login_required
 def pause_subscription(request, pk):
     """Pause a subscription - THIS WAS MISSING"""
+    if request.method == 'POST':
+        # Single conditional UPDATE; 0 rows covers both missing and wrong state
+        if UserSubscription.objects.active().filter(pk=pk, user=request.user).update(status='paused'):
+            clear_active_subscription(request.user.pk)
+            messages.success(request, 'Subscription paused successfully!')
+        else:
+            messages.warning(request, 'Subscription is not active!')
+        return redirect('tenants:subscription_detail', pk=pk)
+    
     subscription = get_object_or_404(UserSubscription, pk=pk, user=request.user)
     
     if not subscription.is_active:
         messages.warning(request, 'Subscription is not active!')
         return redirect('tenants:subscription_detail', pk=subscription.pk)
     
-    if request.method == 'POST':
-        subscription.pause()
-        messages.success(request, 'Subscription paused successfully!')
-        return redirect('tenants:subscription_detail', pk=subscription.pk)
-    
     return render(request, 'tenants/subscription_pause_confirm.html', {
         'subscription': subscription
     })
@@ -73,14 +104,29 @@ def pause_subscription(request, pk):
 @login_required
 def subscription_detail(request, pk):
     """Detail view for a user's subscription"""
-    subscription = get_object_or_404(UserSubscription, pk=pk, user=request.user)
-    
-    active_sessions = ActiveSession.objects.filter(
-        subscription=subscription,
-        session_status='active'
+    subscription = get_object_or_404(
+        UserSubscription.objects.select_related('package', 'user'),
+        pk=pk, user=request.user
     )
     
-    pause_history = PausedSession.objects.filter(session__subscription=subscription)
+    # One query for the sessions and one for all their pauses; each
+    # session carries its own pauses on recent_pauses
+    sessions = list(ActiveSession.objects.filter(
+        subscription=subscription
+    ).select_related('user', 'subscription__package').prefetch_related(
+        Prefetch(
+            'pause_history',
+            queryset=PausedSession.objects.select_related('paused_by').order_by('-paused_at'),
+            to_attr='recent_pauses',
+        )
+    ))
+    
+    active_sessions = [s for s in sessions if s.session_status == 'active']
+    pause_history = sorted(
+        (pause for s in sessions for pause in s.recent_pauses),
+        key=lambda pause: pause.paused_at,
+        reverse=True,
+    )
     
     return render(request, 'tenants/subscription_detail.html', {
         'subscription': subscription,
@@ -92,17 +138,20 @@ def subscription_detail(request, pk):
 @login_required
 def resume_subscription(request, pk):
     """Resume a paused subscription"""
+    if request.method == 'POST':
+        if UserSubscription.objects.filter(pk=pk, user=request.user, status='paused').update(status='active'):
+            clear_active_subscription(request.user.pk)
+            messages.success(request, 'Subscription resumed successfully!')
+        else:
+            messages.warning(request, 'Subscription is not paused!')
+        return redirect('tenants:subscription_detail', pk=pk)
+    
     subscription = get_object_or_404(UserSubscription, pk=pk, user=request.user)
     
     if not subscription.is_paused:
         messages.warning(request, 'Subscription is not paused!')
         return redirect('tenants:subscription_detail', pk=subscription.pk)
     
-    if request.method == 'POST':
-        subscription.unpause()
-        messages.success(request, 'Subscription resumed successfully!')
-        return redirect('tenants:subscription_detail', pk=subscription.pk)
-    
     return render(request, 'tenants/subscription_resume_confirm.html', {
         'subscription': subscription
     })
@@ -113,6 +162,10 @@ def active_session_list(request):
     sessions = ActiveSession.objects.filter(
         user=request.user,
         session_status='active'
+    ).select_related('subscription__package').only(
+        'id', 'session_status', 'start_time', 'end_time', 'data_used_mb',
+        'ip_address', 'mac_address', 'subscription', 'subscription__package',
+        'subscription__package__name',
     ).order_by('-start_time')
     
     return render(request, 'tenants/session_list.html', {
@@ -122,35 +175,74 @@ def active_session_list(request):
 @login_required
 def pause_session(request, pk):
     """Pause an active session"""
+    if request.method == 'POST':
+        data = request.POST.copy()
+        # A missing reason means a plain user pause; a bad one is an error
+        if not data.get('pause_reason'):
+            data['pause_reason'] = PauseReason.USER_REQUEST
+        form = SessionPauseForm(data)
+        if not form.is_valid():
+            session = get_object_or_404(ActiveSession, pk=pk, user=request.user)
+            return render(request, 'tenants/session_pause.html', {
+                'session': session,
+                'form': form,
+            })
+        reason = form.cleaned_data['pause_reason']
+        description = form.cleaned_data['pause_description']
+        # Status flip and pause record commit together: one UPDATE, one INSERT
+        with transaction.atomic():
+            paused = ActiveSession.objects.filter(
+                pk=pk, user=request.user, session_status='active'
+            ).update(session_status='paused')
+            if paused:
+                PausedSession.objects.create(
+                    session_id=pk,
+                    pause_reason=reason,
+                    pause_description=description or None,
+                    paused_by=request.user,
+                )
+        if paused:
+            messages.success(request, 'Session paused successfully!')
+        else:
+            messages.warning(request, 'Session is not active!')
+        return redirect('tenants:session_list')
+    
     session = get_object_or_404(ActiveSession, pk=pk, user=request.user)
     
     if not session.is_active:
         messages.warning(request, 'Session is not active!')
         return redirect('tenants:session_list')
     
-    if request.method == 'POST':
-        session.pause_session()
-        messages.success(request, 'Session paused successfully!')
-        return redirect('tenants:session_list')
-    
     return render(request, 'tenants/session_pause.html', {
-        'session': session
+        'session': session,
+        'form': SessionPauseForm(initial={'pause_reason': PauseReason.USER_REQUEST}),
     })
 
 @login_required
 def resume_session(request, pk):
     """Resume a paused session"""
+    if request.method == 'POST':
+        with transaction.atomic():
+            resumed = ActiveSession.objects.filter(
+                pk=pk, user=request.user, session_status='paused'
+            ).update(session_status='active')
+            if resumed:
+                # Close the open pause in the same transaction, without loading it
+                PausedSession.objects.filter(
+                    session_id=pk, resumed_at__isnull=True
+                ).update(resumed_at=timezone.now())
+        if resumed:
+            messages.success(request, 'Session resumed successfully!')
+        else:
+            messages.warning(request, 'Session is not paused!')
+        return redirect('tenants:session_list')
+    
     session = get_object_or_404(ActiveSession, pk=pk, user=request.user)
     
     if not session.is_paused:
         messages.warning(request, 'Session is not paused!')
         return redirect('tenants:session_list')
     
-    if request.method == 'POST':
-        session.resume_session()
-        messages.success(request, 'Session resumed successfully!')
-        return redirect('tenants:session_list')
-    
     return render(request, 'tenants/session_resume_confirm.html', {
         'session': session
     })
@@ -158,17 +250,19 @@ def resume_session(request, pk):
 @login_required
 def terminate_session(request, pk):
     """Terminate a session"""
+    if request.method == 'POST':
+        if ActiveSession.terminate_where(pk=pk, user=request.user, session_status='active'):
+            messages.success(request, 'Session terminated successfully!')
+        else:
+            messages.warning(request, 'Session is not active!')
+        return redirect('tenants:session_list')
+    
     session = get_object_or_404(ActiveSession, pk=pk, user=request.user)
     
     if not session.is_active:
         messages.warning(request, 'Session is not active!')
         return redirect('tenants:session_list')
     
-    if request.method == 'POST':
-        session.terminate_session()
-        messages.success(request, 'Session terminated successfully!')
-        return redirect('tenants:session_list')
-    
     return render(request, 'tenants/session_terminate_confirm.html', {
         'session': session
     })
@@ -178,51 +272,92 @@ def tenant_dashboard(request):
     """Main dashboard for tenant users"""
     user = request.user
     
-    active_subscription = UserSubscription.objects.filter(
-        user=user,
-        status='active',
-        expiry_date__gte=timezone.now()
-    ).first()
+    active_subscription = get_active_subscription(user)
     
-    active_sessions = ActiveSession.objects.filter(
+    active_sessions = list(ActiveSession.objects.filter(
         user=user,
         session_status='active'
-    )
+    ).select_related('subscription__package'))
     
-    total_data_used = ActiveSession.objects.filter(
-        user=user,
-        start_time__date=timezone.now().date()
-    ).aggregate(total=Sum('data_used_mb'))['total'] or 0
+    total_data_used = get_daily_usage(user)
     
     return render(request, 'tenants/dashboard.html', {
         'active_subscription': active_subscription,
         'active_sessions': active_sessions,
         'total_data_used_today': total_data_used,
-        'session_count': active_sessions.count(),
+        'session_count': len(active_sessions),
     })
 
 @login_required
 def usage_history(request):
     """Usage history page"""
-    sessions = ActiveSession.objects.filter(user=request.user).order_by('-start_time')
-    return render(request, 'tenants/usage_history.html', {'sessions': sessions})
+    sessions = ActiveSession.objects.filter(
+        user=request.user
+    ).select_related('subscription__package', 'user').only(
+        'id', 'user', 'subscription', 'session_status', 'start_time', 'end_time',
+        'data_used_mb', 'user__phone_number', 'subscription__package',
+        'subscription__package__name', 'subscription__package__data_limit_mb',
+    ).order_by('-start_time')
+    page_obj = Paginator(sessions, USAGE_HISTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'tenants/usage_history.html', {
+        'sessions': page_obj.object_list,
+        'page_obj': page_obj,
+    })
+
+class _Echo:
+    """File-like object whose write() hands back the line for streaming"""
+    def write(self, value):
+        return value
+
+@login_required
+def usage_history_export(request):
+    """Stream the user's full usage history as CSV"""
+    sessions = ActiveSession.objects.filter(
+        user=request.user
+    ).select_related('subscription__package').only(
+        'id', 'subscription', 'session_status', 'start_time', 'end_time', 'data_used_mb',
+        'subscription__package', 'subscription__package__name',
+    ).order_by('-start_time')
+    
+    writer = csv.writer(_Echo())
+    
+    def rows():
+        yield writer.writerow(['start_time', 'end_time', 'status', 'package', 'data_used_mb'])
+        # iterator() keeps only one chunk of rows in memory at a time
+        for session in sessions.iterator(chunk_size=500):
+            package = session.subscription.package.name if session.subscription else ''
+            yield writer.writerow([
+                session.start_time.isoformat(),
+                session.end_time.isoformat() if session.end_time else '',
+                session.session_status,
+                package,
+                session.data_used_mb,
+            ])
+    
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="usage_history.csv"'
+    return response
 
 @login_required
 def session_stats(request):
     """Session statistics page"""
-    today = timezone.now().date()
+    today_start, today_end = today_range()
     
-    today_sessions = ActiveSession.objects.filter(
+    # The template lists the rows anyway, so total them from the one SELECT
+    today_sessions = list(ActiveSession.objects.filter(
         user=request.user,
-        start_time__date=today
-    )
+        start_time__gte=today_start,
+        start_time__lt=today_end
+    ).select_related('subscription__package'))
     
-    total_data_today = today_sessions.aggregate(total=Sum('data_used_mb'))['total'] or 0
-    session_count_today = today_sessions.count()
+    total_data_today = sum(s.data_used_mb for s in today_sessions)
+    session_count_today = len(today_sessions)
+    active_count_today = sum(1 for s in today_sessions if s.session_status == 'active')
     
     return render(request, 'tenants/session_stats.html', {
         'total_data_today': total_data_today,
         'session_count_today': session_count_today,
+        'active_count_today': active_count_today,
         'today_sessions': today_sessions,
     })
 
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import BooleanField, Case, DateField, ExpressionWrapper, F, Value, When
 from django.utils import timezone
 from .models import Vendor, Domain
 
@@ -10,6 +11,7 @@ class VendorAdmin(admin.ModelAdmin):
         'license_status', 
         'is_trial',
         'schema_name',
+        'expiry_warning',
         'created_at'
     ]
     list_filter = [
@@ -61,13 +63,56 @@ class VendorAdmin(admin.ModelAdmin):
     
     actions = ['activate_license', 'suspend_license', 'extend_trial']
     
+    def get_queryset(self, request):
+        # Same rules as Vendor.is_license_active / is_trial_active /
+        # should_display_warning, evaluated in SQL so the changelist can sort
+        # and filter on them
+        today = timezone.now().date()
+        return super().get_queryset(request).annotate(
+            _license_active=Case(
+                When(license_status='active', license_end_date__gte=today, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            _trial_active=Case(
+                When(is_trial=True, trial_end_date__gte=today, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            _expiry_warning=Case(
+                When(
+                    license_status='active',
+                    license_end_date__gte=today,
+                    license_end_date__lte=today + timezone.timedelta(days=30),
+                    then=Value(True),
+                ),
+                When(
+                    is_trial=True,
+                    trial_end_date__gte=today,
+                    trial_end_date__lte=today + timezone.timedelta(days=7),
+                    then=Value(True),
+                ),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+    
+    @admin.display(description='Expiry warning', boolean=True, ordering='_expiry_warning')
+    def expiry_warning(self, obj):
+        return obj._expiry_warning
+    
     def activate_license(self, request, queryset):
-        for vendor in queryset:
-            vendor.license_status = 'active'
-            vendor.license_start_date = timezone.now().date()
-            vendor.license_end_date = vendor.license_start_date + timezone.timedelta(days=vendor.license_duration_days)
-            vendor.save()
-        self.message_user(request, f"Activated license for {queryset.count()} vendors.")
+        today = timezone.now().date()
+        # date + integer days is computed per row in SQL, so one UPDATE covers all
+        updated = queryset.update(
+            license_status='active',
+            license_start_date=today,
+            license_end_date=ExpressionWrapper(
+                Value(today, output_field=DateField()) + F('license_duration_days'),
+                output_field=DateField(),
+            ),
+        )
+        self.message_user(request, f"Activated license for {updated} vendors.")
     activate_license.short_description = "Activate license for selected vendors"
     
     def suspend_license(self, request, queryset):
@@ -76,11 +121,10 @@ class VendorAdmin(admin.ModelAdmin):
     suspend_license.short_description = "Suspend license for selected vendors"
     
     def extend_trial(self, request, queryset):
-        for vendor in queryset:
-            if vendor.is_trial and vendor.trial_end_date:
-                vendor.trial_end_date += timezone.timedelta(days=7)
-                vendor.save()
-        self.message_user(request, f"Extended trial for {queryset.count()} vendors.")
+        updated = queryset.filter(is_trial=True, trial_end_date__isnull=False).update(
+            trial_end_date=F('trial_end_date') + timezone.timedelta(days=7)
+        )
+        self.message_user(request, f"Extended trial for {updated} vendors.")
     extend_trial.short_description = "Extend trial by 7 days"
 
 @admin.register(Domain)
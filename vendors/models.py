@@ -72,50 +72,62 @@ class Vendor(TenantMixin, BaseModel):
         return self.business_name
     
     def save(self, *args, **kwargs):
+        today = timezone.now().date()
+        
         # Set trial dates if this is a new vendor
         if self._state.adding and self.is_trial:
-            self.trial_start_date = timezone.now().date()
+            self.trial_start_date = today
             self.trial_end_date = self.trial_start_date + timezone.timedelta(days=self.trial_duration_days)
         
         # Set license dates when activating
         if self.license_status == 'active' and not self.license_start_date:
-            self.license_start_date = timezone.now().date()
+            self.license_start_date = today
             self.license_end_date = self.license_start_date + timezone.timedelta(days=self.license_duration_days)
         
         super().save(*args, **kwargs)
     
+    def _is_license_active(self, today):
+        return bool(
+            self.license_status == 'active' and self.license_end_date
+            and self.license_end_date >= today
+        )
+    
+    def _is_trial_active(self, today):
+        return bool(self.is_trial and self.trial_end_date and self.trial_end_date >= today)
+    
     @property
     def is_license_active(self):
         """Check if license is currently active"""
-        if self.license_status == 'active' and self.license_end_date:
-            return self.license_end_date >= timezone.now().date()
-        return False
+        return self._is_license_active(timezone.now().date())
     
     @property
     def is_trial_active(self):
         """Check if trial period is active"""
-        return self.is_trial and self.trial_end_date and self.trial_end_date >= timezone.now().date()
+        return self._is_trial_active(timezone.now().date())
     
     @property
     def days_until_license_expiry(self):
         """Days remaining until license expiry"""
-        if self.license_end_date and self.is_license_active:
-            return (self.license_end_date - timezone.now().date()).days
+        today = timezone.now().date()
+        if self._is_license_active(today):
+            return (self.license_end_date - today).days
         return 0
     
     @property
     def days_until_trial_end(self):
         """Days remaining until trial ends"""
-        if self.trial_end_date and self.is_trial_active:
-            return (self.trial_end_date - timezone.now().date()).days
+        today = timezone.now().date()
+        if self._is_trial_active(today):
+            return (self.trial_end_date - today).days
         return 0
     
     @property
     def should_display_warning(self):
         """Check if warning should be displayed for upcoming expiry"""
-        if self.is_license_active and self.days_until_license_expiry <= 30:
+        today = timezone.now().date()
+        if self._is_license_active(today) and (self.license_end_date - today).days <= 30:
             return True
-        if self.is_trial_active and self.days_until_trial_end <= 7:
+        if self._is_trial_active(today) and (self.trial_end_date - today).days <= 7:
             return True
         return False
 
@@ -1,12 +1,10 @@
 from django.shortcuts import render
 from .forms import VendorSignupForm, VendorSettingsForm
 from .models import Domain
-from tenants.models import UserSubscription, Transaction
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.utils import timezone
 from django.shortcuts import redirect
-from django.db.models import Sum
+from django.db.models import Count, Q
 
 # vendors/views.py
 def vendor_signup(request):
@@ -33,14 +31,21 @@ def vendor_dashboard(request):
         return redirect('accounts:login')
     
     vendor = request.user.vendor
+    # Users and their active subscriptions counted in one query
+    counts = vendor.users.aggregate(
+        total_users=Count('id', distinct=True),
+        active_subscriptions=Count(
+            'subscriptions',
+            distinct=True,
+            filter=Q(subscriptions__status='active', subscriptions__is_deleted=False),
+        ),
+    )
     stats = {
-        'total_users': vendor.users.count(),
-        'active_subscriptions': UserSubscription.objects.filter(
-            user__vendor=vendor, status='active'
-        ).count(),
-        'revenue_today': Transaction.objects.filter(
-            package__vendor=vendor, created_at__date=timezone.now().date()
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        'total_users': counts['total_users'],
+        'active_subscriptions': counts['active_subscriptions'],
+        # tenants.models has no Transaction model to total yet, so there is no
+        # revenue to report; the template still expects the key
+        'revenue_today': 0,
     }
     
     return render(request, 'vendors/dashboard.html', {